@@ -0,0 +1,123 @@
+"""Compare the ways rows of a setup are loaded into a database
+
+Usage: python -m benchmarks.bulk_loader [database_url]
+
+Measures rows per second of
+- executemany: batched inserts with executemany, the fallback of load_rows
+- copy: load_rows which uses COPY FROM STDIN on postgresql with psycopg2
+- insert file: execution of multi-row INSERT statements of a setup file
+- copy file: execution of a COPY ... FROM stdin block of a setup file
+
+Without a database url an in-memory sqlite database is used, where copy
+and copy file fall back to inserts.
+"""
+
+import sys
+import time
+
+import sqlalchemy
+from sqlalchemy import Boolean, Column, Integer, MetaData, String, Table
+from sqlalchemy.schema import CreateTable
+
+from sql_testing.bulk_loader import (
+    COPY_END,
+    execute_statement,
+    format_copy_rows,
+    get_copy_statement,
+    load_rows,
+)
+from sql_testing.sql_file_generator import SqlFileGenerator
+from sql_testing.utils import get_batches
+
+BATCH_SIZE = 1000
+
+
+def get_rows(n_rows):
+    """create rows of a people table"""
+    return [(i, f"name_{i}", f"name_{i}@mail.com", i % 2 == 0) for i in range(n_rows)]
+
+
+def get_table():
+    """create table object of the benchmark table"""
+    return Table(
+        "benchmark_load",
+        MetaData(),
+        Column("id", Integer),
+        Column("name", String(50)),
+        Column("email", String(50)),
+        Column("is_famous", Boolean),
+    )
+
+
+def load_executemany(conn, table_obj, rows):
+    for batch in get_batches(rows, BATCH_SIZE):
+        keys = [col.key for col in table_obj.columns]
+        conn.execute(table_obj.insert(), [dict(zip(keys, row)) for row in batch])
+
+
+def load_copy(conn, table_obj, rows):
+    for batch in get_batches(rows, BATCH_SIZE):
+        load_rows(conn, table_obj, batch)
+
+
+def load_insert_file(conn, table_obj, rows):
+    generator = SqlFileGenerator(conn.engine, "benchmark.yaml")
+    statements = [
+        generator._get_insert_statement(conn, table_obj, batch)
+        for batch in get_batches(rows, BATCH_SIZE)
+    ]
+    start = time.perf_counter()
+    for statement in statements:
+        execute_statement(conn, statement)
+    return time.perf_counter() - start
+
+
+def load_copy_file(conn, table_obj, rows):
+    statement = (
+        get_copy_statement(conn.dialect.identifier_preparer, table_obj)
+        + ";\n"
+        + format_copy_rows(rows)
+        + COPY_END
+    )
+    start = time.perf_counter()
+    execute_statement(conn, statement)
+    return time.perf_counter() - start
+
+
+def measure(url, load, rows):
+    """get rows per second of a load function"""
+    # use a new engine as sqlite does not roll back create table statements
+    engine = sqlalchemy.create_engine(url)
+    table_obj = get_table()
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        conn.execute(CreateTable(table_obj))
+
+        start = time.perf_counter()
+        duration = load(conn, table_obj, rows)
+        if duration is None:
+            duration = time.perf_counter() - start
+
+        transaction.rollback()
+    engine.dispose()
+    return len(rows) / duration
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "sqlite://"
+    loaders = {
+        "executemany": load_executemany,
+        "copy": load_copy,
+        "insert file": load_insert_file,
+        "copy file": load_copy_file,
+    }
+
+    print(f"{'rows':>8} " + " ".join(f"{name:>12}" for name in loaders) + "  (rows/s)")
+    for n_rows in [10_000, 100_000]:
+        rows = get_rows(n_rows)
+        results = [measure(url, load, rows) for load in loaders.values()]
+        print(f"{n_rows:>8} " + " ".join(f"{result:>12.0f}" for result in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the single pass identifier rewriter with the former regex loop
+
+Usage: python -m benchmarks.identifier_rewriter
+"""
+
+import re
+import time
+
+from sql_testing.identifier_rewriter import IdentifierRewriter
+
+N_TABLES = 120
+
+
+def legacy_rewrite(file_content, mapping_dict):
+    """former implementation of DbSpecificTest.read_sql_file"""
+    for original_obj, test_obj in mapping_dict.items():
+        pattern = rf"\s{original_obj}\s"
+        new_name = " " + test_obj + " "
+        file_content = re.sub(pattern, new_name, file_content)
+    return file_content
+
+
+def get_sql_text(n_statements):
+    """create a setup file with inserts into N_TABLES different tables"""
+    statements = [
+        f"insert into table_{i % N_TABLES} values ({i}, 'value_{i}', {i * 2})"
+        for i in range(n_statements)
+    ]
+    return " ; ".join(statements)
+
+
+def measure(func, *args, repeat=3):
+    """get best wall time of multiple calls"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def main():
+    mapping_dict = {f"table_{i}": f"table_{i}_abc12" for i in range(N_TABLES)}
+    rewriter = IdentifierRewriter(mapping_dict)
+
+    print(
+        f"{'size (KiB)':>12} {'legacy (s)':>12} {'single pass (s)':>16} {'speedup':>8}"
+    )
+    for n_statements in [1_000, 10_000, 50_000, 100_000]:
+        sql_text = get_sql_text(n_statements)
+        legacy = measure(legacy_rewrite, sql_text, mapping_dict)
+        single_pass = measure(rewriter.rewrite, sql_text)
+        print(
+            f"{len(sql_text) / 1024:>12.0f} {legacy:>12.4f} {single_pass:>16.4f} "
+            f"{legacy / single_pass:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
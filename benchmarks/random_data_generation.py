@@ -0,0 +1,36 @@
+"""Compare python and numpy generation of random columns
+
+Usage: python -m benchmarks.random_data_generation
+"""
+
+import time
+
+from sql_testing.utils import get_random_array, get_random_list
+
+SPECIFICATIONS = {
+    "int": {"type": "Integer", "values": "random", "value_range": [0, 10**9]},
+    "unique int": {"type": "Integer", "values": "random", "unique": True},
+    "bool": {"type": "Boolean", "values": "random"},
+    "str": {"type": "String", "values": "random"},
+    "unique str": {"type": "String", "values": "random", "unique": True},
+}
+
+
+def measure(func, *args):
+    """get wall time of a single call"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main(n_rows=1_000_000):
+    print(f"{n_rows} rows")
+    print(f"{'column':>12} {'python (s)':>12} {'numpy (s)':>12} {'speedup':>8}")
+    for name, specification in SPECIFICATIONS.items():
+        python = measure(get_random_list, specification, n_rows)
+        numpy = measure(get_random_array, specification, n_rows)
+        print(f"{name:>12} {python:>12.4f} {numpy:>12.4f} {python / numpy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
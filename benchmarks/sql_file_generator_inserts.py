@@ -0,0 +1,70 @@
+"""Measure rows per second of SqlFileGenerator for different batch sizes
+
+Usage: python -m benchmarks.sql_file_generator_inserts [database_url]
+
+A batch size of 1 corresponds to the former implementation with one insert
+statement per row. Without a database url an in-memory sqlite database is used.
+"""
+
+import os
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+import sqlalchemy
+import yaml
+
+from sql_testing.sql_file_generator import SqlFileGenerator
+
+
+def get_setup_config(n_rows):
+    """create a yaml config with one table with n_rows rows"""
+    return {
+        "tables": {
+            "benchmark_people": {
+                "exists": False,
+                "number_of_rows": n_rows,
+                "column_names": {
+                    "contact_id": {
+                        "type": "Integer",
+                        "values": "random",
+                        "unique": True,
+                    },
+                    "first_name": {"type": "String", "values": "random"},
+                    "email": {"type": "String", "values": "random", "unique": True},
+                    "is_famous": {"type": "Boolean", "values": "random"},
+                },
+            }
+        }
+    }
+
+
+def measure(url, n_rows, batch_size):
+    """get rows per second of a sql file generation"""
+    with TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "setup.yaml")
+        with open(path, "w") as file:
+            yaml.safe_dump(get_setup_config(n_rows), file)
+
+        # use a new engine as sqlite does not roll back create table statements
+        engine = sqlalchemy.create_engine(url)
+        generator = SqlFileGenerator(engine, path, batch_size=batch_size)
+        start = time.perf_counter()
+        generator.generate_sql_file()
+        return n_rows / (time.perf_counter() - start)
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "sqlite://"
+
+    print(f"{'rows':>8} {'batch size':>11} {'rows/s':>10}")
+    for n_rows in [1_000, 10_000, 100_000]:
+        for batch_size in [1, 100, 1000, 10000]:
+            if batch_size == 1 and n_rows > 10_000:
+                continue
+            rows_per_second = measure(url, n_rows, batch_size)
+            print(f"{n_rows:>8} {batch_size:>11} {rows_per_second:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
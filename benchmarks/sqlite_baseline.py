@@ -0,0 +1,61 @@
+"""Compare executed and cloned setups of sqlite tests
+
+Usage: python -m benchmarks.sqlite_baseline
+
+Measures the time of a test run of BaseTest on in-memory sqlite where
+- execute: the setup file is executed by every run
+- clone: the setup is executed once into a baseline which every run copies
+  with the backup API of sqlite3
+"""
+
+import os
+import time
+from tempfile import TemporaryDirectory
+
+from sql_testing.base_test import BaseTest
+
+N_RUNS = 20
+
+
+def write_files(temp_dir, n_rows):
+    """write a setup with a table of n rows and a call which counts them"""
+    path_setup = os.path.join(temp_dir, "setup.sql")
+    with open(path_setup, "w") as file:
+        file.write("CREATE TABLE people (id INTEGER, name VARCHAR(50));\n")
+        for start in range(0, n_rows, 1000):
+            rows = range(start, min(start + 1000, n_rows))
+            values = ", ".join(f"({i}, 'name_{i}')" for i in rows)
+            file.write(f"INSERT INTO people VALUES {values};\n")
+
+    path_call = os.path.join(temp_dir, "call.sql")
+    with open(path_call, "w") as file:
+        file.write("CREATE VIEW n_people AS SELECT count(*) AS n FROM people;")
+
+    return path_setup, path_call
+
+
+def measure(path_setup, path_call, clone_setup):
+    """get mean time of a test run in milliseconds"""
+    test = BaseTest(path_setup, path_call, "n_people", clone_setup=clone_setup)
+    # the first run creates the baseline
+    with test.run():
+        pass
+
+    start = time.perf_counter()
+    for _ in range(N_RUNS):
+        with test.run():
+            pass
+    return (time.perf_counter() - start) / N_RUNS * 1000
+
+
+def main():
+    print(f"{'rows':>8} {'execute':>12} {'clone':>12}  (ms per run)")
+    for n_rows in [1_000, 10_000, 100_000]:
+        with TemporaryDirectory() as temp_dir:
+            path_setup, path_call = write_files(temp_dir, n_rows)
+            results = [measure(path_setup, path_call, clone) for clone in (False, True)]
+        print(f"{n_rows:>8} " + " ".join(f"{result:>12.2f}" for result in results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare the batch modes of execute_files for setups with many small inserts
+
+Usage: python -m benchmarks.statement_batching [database_url]
+
+Measures statements per second of a setup file with single-row INSERT
+statements executed
+- statement: statement by statement
+- inserts: consecutive INSERT statements combined into multi-row inserts
+- script: all statements at once (postgresql with psycopg2, otherwise like
+  inserts)
+
+Without a database url an in-memory sqlite database is used.
+"""
+
+import os
+import sys
+import time
+from tempfile import TemporaryDirectory
+
+import sqlalchemy
+
+from sql_testing.base_test import BaseTest
+
+
+def write_setup(path, n_rows):
+    """write a setup file with one INSERT statement per row"""
+    with open(path, "w") as file:
+        file.write("CREATE TABLE benchmark_batching (id INTEGER, name VARCHAR(50));\n")
+        for i in range(n_rows):
+            file.write(f"INSERT INTO benchmark_batching VALUES ({i}, 'name_{i}');\n")
+
+
+def measure(url, path_setup, path_call, batch_mode, n_rows):
+    """get statements per second of the setup in a batch mode"""
+    # use a new engine as sqlite does not roll back create table statements
+    engine = sqlalchemy.create_engine(url)
+    test = BaseTest(path_setup, path_call, "benchmark_batching", batch_mode=batch_mode)
+    statements = test.read_sql_file(path_setup)
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        start = time.perf_counter()
+        test._execute_statements(conn, path_setup, statements)
+        duration = time.perf_counter() - start
+        transaction.rollback()
+    engine.dispose()
+    return n_rows / duration
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else "sqlite://"
+    batch_modes = ["statement", "inserts", "script"]
+
+    print(
+        f"{'rows':>8} " + " ".join(f"{mode:>12}" for mode in batch_modes) + "  (rows/s)"
+    )
+    with TemporaryDirectory() as temp_dir:
+        path_setup = os.path.join(temp_dir, "setup.sql")
+        path_call = os.path.join(temp_dir, "call.sql")
+        with open(path_call, "w") as file:
+            file.write("SELECT 1;")
+
+        for n_rows in [1_000, 10_000, 50_000]:
+            write_setup(path_setup, n_rows)
+            results = [
+                measure(url, path_setup, path_call, mode, n_rows)
+                for mode in batch_modes
+            ]
+            print(f"{n_rows:>8} " + " ".join(f"{result:>12.0f}" for result in results))
+
+
+if __name__ == "__main__":
+    main()
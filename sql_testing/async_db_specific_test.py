@@ -0,0 +1,125 @@
+from contextlib import asynccontextmanager
+
+from sqlalchemy.schema import DropSchema
+
+from .db_specific_test import DbSpecificTest
+from .instrumentation import ExecutionReport
+from .result_comparison import compare_tables
+
+
+class AsyncDbSpecificTest(DbSpecificTest):
+    """Class for testing dialect specific SQL with an async engine
+
+    Works like DbSpecificTest, but uses an engine of create_async_engine,
+    e.g. with asyncpg, and run() is an async context manager. The files are
+    parsed and executed by the code of DbSpecificTest on the sync facade of
+    the async connection, hence both classes rename, execute and roll back
+    in the same way. While a test waits for the database the event loop can
+    run other tests, see AsyncSuiteRunner.
+
+    Template isolation is not supported as template databases are created
+    with sync engines.
+
+    :Example:
+
+        engine = create_async_engine("postgresql+asyncpg://...")
+        test = AsyncDbSpecificTest(engine, "setup.sql", "call.sql", "target")
+        async with test.run() as result:
+            test.compare_table_values(result, expected)
+
+    :param engine: async engine to use
+    :param path_test_setup: path to test setup with sql statements
+    :param path_to_call: path to statement which shall be tested
+    :param target: target table/view where the result can be found
+    :param isolation: isolation mode, either "rename" or "schema"
+    :param expected: path to a csv or parquet file with the expected output
+    :param explain: whether to add query plans of the call file to the report
+    :param batch_mode: batch mode of setup files, one of "statement",
+        "inserts" or "script"
+    """
+
+    ISOLATION_MODES = ("rename", "schema")
+
+    @asynccontextmanager
+    async def _execute_test(self, budget=None):
+        """execute setup and call, yield connection and a table getter
+
+        The table getter uses the sync facade of the connection, hence it
+        has to be called inside of run_sync.
+        """
+        self.execution_report = ExecutionReport()
+        async with self.engine.connect() as connection:
+            transaction = await connection.begin()
+
+            with self.execution_report.record(connection.sync_connection):
+                get_table, schema = await connection.run_sync(
+                    self._execute_test_files,
+                    [self.path_test_setup, self.path_to_call],
+                    budget,
+                )
+
+                yield connection, get_table
+
+                # drop all test objects at once
+                if schema is not None:
+                    await connection.execute(DropSchema(schema, cascade=True))
+
+            await transaction.rollback()
+
+    @asynccontextmanager
+    async def run(self, stream=False, budget=None):
+        """run test
+
+        :param stream: whether to yield an async streamed result instead of a
+            list, hence large targets are not loaded into memory at once
+        :param budget: PerformanceBudget the call has to meet, the result of
+            the check is stored in budget_result
+        :raise AssertionError: if the call exceeds the budget
+        """
+        async with self._execute_test(budget) as (conn, get_table):
+            # get target table instance
+            target_table_instance = await conn.run_sync(
+                lambda _: get_table(self.target)
+            )
+
+            # get all entries in table and yield the result
+            if stream:
+                yield await conn.stream(target_table_instance.select())
+            else:
+                result = await conn.execute(target_table_instance.select())
+                yield result.all()
+
+    async def compare_with_table(self, expected_table, max_differences=10):
+        """Run test and compare the target with a table of expected rows
+
+        See DbSpecificTest.compare_with_table.
+        """
+        async with self._execute_test() as (conn, get_table):
+            return await conn.run_sync(
+                lambda sync_conn: compare_tables(
+                    sync_conn,
+                    get_table(expected_table),
+                    get_table(self.target),
+                    max_differences,
+                )
+            )
+
+    async def compare_with_expected(
+        self, ordered=True, max_differences=10, column_types=None, batch_size=1000
+    ):
+        """Run test and compare the target with the expected file
+
+        See DbSpecificTest.compare_with_expected.
+        """
+        if self.path_expected is None:
+            raise ValueError("No expected file was provided")
+
+        async with self._execute_test() as (conn, get_table):
+            return await conn.run_sync(
+                self._compare_with_expected_file,
+                get_table,
+                ordered,
+                max_differences,
+                column_types,
+                batch_size,
+            )
@@ -1,8 +1,27 @@
 # import logging
 import os
+import time
 from contextlib import contextmanager
+from functools import partial
 
-from sqlalchemy import MetaData, create_engine
+from sqlalchemy.exc import DBAPIError
+
+from .bulk_loader import execute_statement
+from .expected_results import read_expected_rows
+from .instrumentation import ExecutionReport
+from .reflection_cache import reflect_table
+from .result_comparison import compare_rows, compare_tables
+from .sql_tokenizer import split_statements
+from .sqlite_baseline import memory_engine, sqlite_baselines
+from .statement_batching import BATCH_MODES, batch_statements
+from .statement_cache import statement_cache
+
+# prefix of statements which get the plan of a statement and whether the
+# statement is executed by it, hence it has to run inside of a savepoint
+_EXPLAIN_PREFIXES = {
+    "postgresql": ("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ", True),
+    "sqlite": ("EXPLAIN QUERY PLAN ", False),
+}
 
 
 class BaseTest:
@@ -15,24 +34,64 @@ class BaseTest:
     path_to_call). The last step compares the result of the second step with
     the expected output provided in path_expected.
 
+    All executed statements are timed and collected in execution_report,
+    which contains the file and ordinal of every statement of the sql files.
+    With explain=True the query plan of every statement of the call file is
+    added to the report (postgresql and sqlite only).
+
+    Setup files can be executed in batches, see batch_statements. The call
+    file is always executed statement by statement, hence the statements
+    under test are timed and explained on their own.
+
+    Every run is executed in a transaction which is rolled back at the end,
+    hence tests can share an engine. Without an engine every run gets a new
+    in-memory sqlite database. With
+    clone_setup=True the setup is executed only once into a shared
+    in-memory baseline and every run gets a copy of it, see SqliteBaseline.
+
     :param path_test_setup: path to test setup with sql statements
     :param path_to_call: path to statement which shall be tested
     :param target: target table/view where the result can be found
     :param engine: engine to use
+    :param expected: path to a csv or parquet file with the expected output
+    :param explain: whether to add query plans of the call file to the report
+    :param batch_mode: batch mode of setup files, one of "statement",
+        "inserts" or "script"
+    :param clone_setup: whether runs clone a sqlite baseline of the setup
+        instead of executing it, requires the default engine
     """
 
-    def __init__(self, path_test_setup, path_to_call, target, engine=None):
+    def __init__(
+        self,
+        path_test_setup,
+        path_to_call,
+        target,
+        engine=None,
+        expected=None,
+        explain=False,
+        batch_mode="statement",
+        clone_setup=False,
+    ):
+        if batch_mode not in BATCH_MODES:
+            raise ValueError(f"Batch mode {batch_mode} is not one of {BATCH_MODES}")
+        if clone_setup and engine is not None:
+            raise ValueError("Setups can only be cloned without an engine")
 
         self.path_test_setup = path_test_setup
         self.path_to_call = path_to_call
+        self.path_expected = expected
         self.target = target
+        self.explain = explain
+        self.batch_mode = batch_mode
+        self.clone_setup = clone_setup
+        self.execution_report = ExecutionReport()
+        self.budget_result = None
 
         # check if defined files exist
         self.check_file_existence()
 
-        # get sqlite engine for non dialect tests
-        if engine is None:
-            self.engine = create_engine("sqlite://")
+        # use in-memory sqlite databases for non dialect tests
+        self.engine = memory_engine if engine is None else engine
 
     def check_file_existence(self):
         """check if input files exist
@@ -47,61 +106,249 @@ class BaseTest:
         # get class items
         for var, path in self.__dict__.items():
             # check if "path_" is included in variable name
-            if "path_" in var and not os.path.isfile(path):
+            if "path_" in var and path is not None and not os.path.isfile(path):
                 raise FileNotFoundError(f"File {path} does not exist")
 
+    @staticmethod
+    def _get_file_type(path):
+        """get file type of a path, e.g. sql for setup.sql and setup.sql.gz"""
+        path = str(path)
+        if path.endswith(".gz"):
+            path = path[: -len(".gz")]
+        return path.split(".")[-1]
+
     @staticmethod
     def read_sql_file(path, statement_separator=";", mapping_dict=None):
         """Read provided sql file"""
-        with open(path, "r") as file:
-            file_content = file.read()
-
-        return file_content.split(statement_separator)
+        return list(statement_cache.get(path, split_statements, statement_separator))
 
     def execute_files(self, path_to_file, conn):
         """Execute multiple sql statements"""
 
         # read sql file
         statements = self.read_sql_file(path_to_file)
+        self._execute_statements(conn, path_to_file, statements)
 
-        for statement in statements:
-            if len(statement.replace(" ", "")) > 0:
-                conn.execute(statement)
+    def _execute_statements(self, conn, path_to_file, statements):
+        """execute the statements of a file in the batch mode of the test"""
+        batch_mode = self.batch_mode
+        if path_to_file == self.path_to_call:
+            batch_mode = "statement"
 
-    def _get_db_obj_by_name(self, engine, name):
-        """search a db object like a view or table by name"""
-        meta_data = self._get_db_objects(engine)
-        return meta_data.tables[name]
+        for ordinal, statement in batch_statements(
+            statements, batch_mode, conn.dialect
+        ):
+            self._execute_statement(conn, path_to_file, ordinal, statement)
+
+    def _execute_statement(self, conn, path_to_file, ordinal, statement):
+        """execute a statement and label it in the execution report"""
+        plan = None
+        if self.explain and path_to_file == self.path_to_call:
+            plan = self._explain_statement(conn, statement)
+
+        with self.execution_report.statement(path_to_file, ordinal, plan):
+            execute_statement(conn, statement)
+
+    def _explain_statement(self, conn, statement):
+        """get the query plan of a statement, None if it can not be explained"""
+        dialect = conn.dialect.name
+        if dialect not in _EXPLAIN_PREFIXES:
+            raise NotImplementedError(f"Explain is not implemented for {dialect}")
+        prefix, executes = _EXPLAIN_PREFIXES[dialect]
+
+        with self.execution_report.paused():
+            # EXPLAIN ANALYZE executes the statement, hence its changes and
+            # errors of statements like CREATE VIEW are rolled back
+            savepoint = conn.begin_nested() if executes else None
+            try:
+                rows = conn.exec_driver_sql(prefix + statement.strip()).all()
+            except DBAPIError:
+                if savepoint is None:
+                    raise
+                rows = None
+            finally:
+                if savepoint is not None:
+                    savepoint.rollback()
+
+        if not rows:
+            return None
+        # postgresql returns the whole plan as a single json value
+        if len(rows) == 1 and len(rows[0]) == 1:
+            return rows[0][0]
+        return [list(row) for row in rows]
 
     @staticmethod
-    def _get_db_objects(engine):
-        """search db objects like views or tables"""
-        meta_data = MetaData(engine)
-        meta_data.reflect(views=True)
-        return meta_data
+    def _get_db_obj_by_name(engine, name, schema=None):
+        """search a db object like a view or table by name"""
+        # reflect only the object we are looking for. The object is part of
+        # the test transaction, hence it must not be cached
+        return reflect_table(engine, name, schema)
+
+    def _check_budget(self, conn, budget, mapping_dict=None):
+        """measure the call in savepoints and check it against a budget
+
+        :raise AssertionError: if a limit of the budget is exceeded
+        """
+        if budget.needs_plans and conn.dialect.name != "postgresql":
+            raise NotImplementedError(
+                f"Planner costs are not implemented for {conn.dialect.name}"
+            )
+
+        statements = [
+            statement
+            for statement in self.read_sql_file(
+                self.path_to_call, mapping_dict=mapping_dict
+            )
+            if len(statement.strip()) > 0
+        ]
+
+        def execute_call(explain=False):
+            plans = []
+            savepoint = conn.begin_nested()
+            try:
+                start = time.perf_counter()
+                for statement in statements:
+                    if explain:
+                        plans.append(self._explain_statement(conn, statement))
+                    execute_statement(conn, statement)
+                return time.perf_counter() - start, plans
+            finally:
+                savepoint.rollback()
+
+        # measured executions are not part of the execution report
+        with self.execution_report.paused():
+            for _ in range(budget.warmup):
+                execute_call()
+            times = [execute_call()[0] for _ in range(budget.iterations)]
+            plans = execute_call(explain=True)[1] if budget.needs_plans else []
+
+        self.budget_result = budget.check(times, plans, key=str(self.path_to_call))
+        assert self.budget_result.passed, self.budget_result.summary()
 
     @contextmanager
-    def run(self):
-        """run test"""
+    def _execute_test(self, budget=None):
+        """execute setup and call, yield connection and a table getter"""
+
+        engine = self.engine
+        if self.clone_setup:
+            # every connection is a copy of the baseline with the setup
+            engine = sqlite_baselines.get_baseline(
+                self.path_test_setup,
+                self.read_sql_file(self.path_test_setup),
+                self.batch_mode,
+            ).engine
+
+        self.execution_report = ExecutionReport()
+        with engine.connect() as conn, self.execution_report.record(conn):
+            # use a transaction which is rolled back at the end, hence tests
+            # can share an engine. The savepoint starts the transaction for
+            # pysqlite, which would execute ddl outside of it otherwise
+            transaction = conn.begin()
+            conn.begin_nested()
 
-        with self.engine.begin() as conn:
             # execute multiple sql statements to setup testing
-            self.execute_files(conn=conn, path_to_file=self.path_test_setup)
+            if not self.clone_setup:
+                self.execute_files(conn=conn, path_to_file=self.path_test_setup)
+
+            # measure the call against the state after the setup
+            if budget is not None:
+                self._check_budget(conn, budget)
 
             # execute main sql statement which shall be tested
             self.execute_files(conn=conn, path_to_file=self.path_to_call)
 
+            yield conn, partial(self._get_db_obj_by_name, conn)
+
+            # rollback transaction
+            transaction.rollback()
+
+    @contextmanager
+    def run(self, stream=False, budget=None):
+        """run test
+
+        :param stream: whether to yield a streamed result instead of a list,
+            hence large targets are not loaded into memory at once
+        :param budget: PerformanceBudget the call has to meet, the result of
+            the check is stored in budget_result
+        :raise AssertionError: if the call exceeds the budget
+        """
+
+        with self._execute_test(budget) as (conn, get_table):
             # get target table instance
-            target_table_instance = self._get_db_obj_by_name(conn, self.target)
+            target_table_instance = get_table(self.target)
 
             # get all entries in table and yield the result
-            yield conn.execute(target_table_instance.select()).all()
+            if stream:
+                yield conn.execution_options(stream_results=True).execute(
+                    target_table_instance.select()
+                )
+            else:
+                yield conn.execute(target_table_instance.select()).all()
 
-    @staticmethod
-    def compare_table_values(target, expected):
-        """Compare target table output to expected output"""
+    def compare_with_table(self, expected_table, max_differences=10):
+        """Run test and compare the target with a table of expected rows
+
+        The expected table has to be created by the setup or call file. The
+        rows are compared as multisets inside the database if possible.
 
-        for exp, tar in zip(expected, target):
-            assert exp == tar, (
-                f"Expected (={exp}) and result (={tar}) is not " f"the same"
+        :param expected_table: name of table or view with the expected rows
+        :param max_differences: maximal number of reported differing rows
+        :return: ComparisonResult
+        """
+        with self._execute_test() as (conn, get_table):
+            return compare_tables(
+                conn, get_table(expected_table), get_table(self.target), max_differences
             )
+
+    def compare_with_expected(
+        self, ordered=True, max_differences=10, column_types=None, batch_size=1000
+    ):
+        """Run test and compare the target with the expected file
+
+        The expected file is read in batches and compared with the streamed
+        target, hence neither side is loaded into memory at once. Values of
+        csv files are converted to the types of the target columns unless
+        column_types contains another conversion.
+
+        :param ordered: whether the order of rows has to be equal
+        :param max_differences: maximal number of reported differing rows
+        :param column_types: conversions of columns, see read_expected_rows
+        :param batch_size: number of rows read at once
+        :return: ComparisonResult
+        :raise ValueError: if no expected file was provided
+        """
+        if self.path_expected is None:
+            raise ValueError("No expected file was provided")
+
+        with self._execute_test() as (conn, get_table):
+            return self._compare_with_expected_file(
+                conn, get_table, ordered, max_differences, column_types, batch_size
+            )
+
+    def _compare_with_expected_file(
+        self, conn, get_table, ordered, max_differences, column_types, batch_size
+    ):
+        """compare the streamed target with the batches of the expected file"""
+        target_table_instance = get_table(self.target)
+        expected = read_expected_rows(
+            self.path_expected, column_types, batch_size, target_table_instance
+        )
+        target = conn.execution_options(
+            stream_results=True, max_row_buffer=batch_size
+        ).execute(target_table_instance.select())
+        return compare_rows(expected, target, ordered, max_differences, batch_size)
+
+    @staticmethod
+    def compare_table_values(target, expected, ordered=True, max_differences=10):
+        """Compare target table output to expected output
+
+        :param target: rows of the target, e.g. a streamed result
+        :param expected: expected rows
+        :param ordered: whether the order of rows has to be equal
+        :param max_differences: maximal number of reported differing rows
+        :return: ComparisonResult
+        :raise AssertionError: if the number of rows or any row differs
+        """
+        result = compare_rows(expected, target, ordered, max_differences)
+        assert result.passed, result.summary()
+        return result
@@ -0,0 +1,164 @@
+import io
+import re
+
+from sqlalchemy import text
+
+from .sql_tokenizer import split_copy_rows
+
+# marker of NULL values and end of rows in the COPY text format
+COPY_NULL = "\\N"
+COPY_END = "\\."
+
+_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+_ESCAPE_PATTERN = re.compile(r"[\\\t\n\r]")
+_UNESCAPES = {"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f", "v": "\v"}
+_UNESCAPE_PATTERN = re.compile(r"\\(.)")
+
+_STDIN_PATTERN = re.compile("stdin", re.I)
+
+# table and optional column list of a COPY ... FROM stdin statement
+_COPY_TARGET_PATTERN = re.compile(
+    r"^\s*copy\s+(?P<table>.+?)\s*(?:\((?P<columns>[^)]*)\))?\s*$", re.I | re.S
+)
+
+
+def supports_copy(dialect):
+    """Check if rows can be loaded with COPY ... FROM STDIN"""
+    return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+
+def format_copy_value(value):
+    """Format a value for the text format of COPY
+
+    Booleans are formatted as 1 and 0 as these are valid booleans in
+    postgresql and stay booleans in databases without a boolean type.
+    """
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, str):
+        return _ESCAPE_PATTERN.sub(lambda match: _ESCAPES[match.group()], value)
+    return str(value)
+
+
+def format_copy_rows(rows):
+    """Format rows as lines of the text format of COPY"""
+    return "".join(
+        "\t".join(format_copy_value(value) for value in row) + "\n" for row in rows
+    )
+
+
+def parse_copy_value(value):
+    """Parse a value of the text format of COPY, all values are strings"""
+    if value == COPY_NULL:
+        return None
+    if "\\" not in value:
+        return value
+    return _UNESCAPE_PATTERN.sub(
+        lambda match: _UNESCAPES.get(match.group(1), match.group(1)), value
+    )
+
+
+def parse_copy_rows(copy_rows):
+    """Parse lines of the text format of COPY into rows"""
+    lines = copy_rows.split("\n")
+    if lines[-1] == "":
+        lines.pop()
+    return [[parse_copy_value(value) for value in line.split("\t")] for line in lines]
+
+
+def get_copy_statement(preparer, table_obj):
+    """Get a COPY ... FROM stdin statement for all columns of a table"""
+    columns = ", ".join(preparer.format_column(col) for col in table_obj.columns)
+    return f"COPY {preparer.format_table(table_obj)} ({columns}) FROM stdin"
+
+
+def copy_rows(conn, table_obj, rows):
+    """Load rows with COPY ... FROM STDIN via the raw psycopg2 connection"""
+    statement = get_copy_statement(conn.dialect.identifier_preparer, table_obj)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(statement, io.StringIO(format_copy_rows(rows)))
+    finally:
+        cursor.close()
+
+
+def load_rows(conn, table_obj, rows):
+    """Load rows into a table
+
+    COPY is used if the dialect supports it, otherwise the rows are
+    inserted with one executemany call.
+
+    :param conn: connection to use
+    :param table_obj: table the rows are loaded into
+    :param rows: rows with values in the order of the table columns
+    """
+    if not rows:
+        return
+    if supports_copy(conn.dialect):
+        copy_rows(conn, table_obj, rows)
+    else:
+        keys = [col.key for col in table_obj.columns]
+        conn.execute(table_obj.insert(), [dict(zip(keys, row)) for row in rows])
+
+
+def split_copy_statement(statement):
+    """Split a COPY ... FROM stdin statement with rows
+
+    :param statement: sql text of a single statement
+    :return: tuple with the COPY statement and its rows or None if the
+        statement is no COPY statement with rows
+    """
+    # most statements are no COPY statements, hence check this fast first
+    if _STDIN_PATTERN.search(statement) is None:
+        return None
+
+    parts = list(split_copy_rows(statement))
+    if len(parts) == 1:
+        return None
+    (copy_statement, _), (rows, _) = parts[:2]
+    return copy_statement.strip().rstrip(";"), rows
+
+
+def execute_statement(conn, statement):
+    """Execute a statement, COPY ... FROM stdin statements are supported
+
+    Rows of COPY statements are loaded with COPY if the dialect supports it.
+    For all other dialects the rows are inserted as strings, hence the
+    database has to convert them to the column types.
+    """
+    copy_statement = split_copy_statement(statement)
+    if copy_statement is None:
+        return conn.exec_driver_sql(statement)
+
+    copy_statement, rows = copy_statement
+    if supports_copy(conn.dialect):
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(copy_statement, io.StringIO(rows))
+        finally:
+            cursor.close()
+        return None
+
+    _insert_copy_rows(conn, copy_statement, parse_copy_rows(rows))
+    return None
+
+
+def _insert_copy_rows(conn, copy_statement, rows):
+    """insert rows of a COPY statement for dialects without COPY"""
+    if not rows:
+        return
+
+    target = copy_statement[: copy_statement.lower().rindex("from")]
+    match = _COPY_TARGET_PATTERN.match(target)
+    if match is None:
+        raise ValueError(f"Can not parse COPY statement {copy_statement}")
+
+    parameters = [f"p{index}" for index in range(len(rows[0]))]
+    columns = f" ({match.group('columns')})" if match.group("columns") else ""
+    insert = text(
+        f"INSERT INTO {match.group('table')}{columns} "
+        f"VALUES ({', '.join(':' + name for name in parameters)})"
+    )
+    conn.execute(insert, [dict(zip(parameters, row)) for row in rows])
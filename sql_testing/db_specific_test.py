@@ -1,18 +1,91 @@
 from contextlib import contextmanager
-from re import sub
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateSchema, DropSchema
 
 from .base_test import BaseTest
+from .identifier_rewriter import IdentifierRewriter
+from .instrumentation import ExecutionReport
+from .reflection_cache import get_existing_object_names
 from .sql_statement_properties import SqlStatementProperties
+from .sql_tokenizer import split_statements, transform_sql
+from .statement_cache import statement_cache
+from .template_database import TemplateDatabaseCache
 from .utils import get_random_suffix
 
 
+def _normalize_sql(file_content):
+    """use lower case for all statements, rows of COPY statements are kept"""
+    return transform_sql(file_content, str.lower)
+
+
+def _split_normalized_sql(file_content, statement_separator):
+    """normalize file content and split it into statements"""
+    return split_statements(_normalize_sql(file_content), statement_separator)
+
+
+def _get_normalized_sql_properties(file_content):
+    """normalize file content and search statements and db objects"""
+    return SqlStatementProperties.from_sql(_normalize_sql(file_content))
+
+
 class DbSpecificTest(BaseTest):
-    def __init__(self, engine, path_test_setup, path_to_call, target):
+    """Class for testing dialect specific SQL in a real database
+
+    All statements are executed in a transaction which is rolled back at the
+    end of the test. To avoid collisions with existing objects the test is
+    isolated in one of the following ways:
+
+    - rename: all tables and views get a random suffix
+    - schema: the files are executed unmodified in a temporary schema which
+      is set as search_path (postgresql only)
+    - template: the setup is executed once into a template database which
+      is cached until the setup changes. Every test runs the call in a copy
+      of the template (postgresql only)
+
+    :param engine: engine to use
+    :param path_test_setup: path to test setup with sql statements
+    :param path_to_call: path to statement which shall be tested
+    :param target: target table/view where the result can be found
+    :param isolation: isolation mode, either "rename", "schema" or "template"
+    :param expected: path to a csv or parquet file with the expected output
+    :param explain: whether to add query plans of the call file to the report
+    :param batch_mode: batch mode of setup files, one of "statement",
+        "inserts" or "script"
+    """
+
+    ISOLATION_MODES = ("rename", "schema", "template")
+
+    def __init__(
+        self,
+        engine,
+        path_test_setup,
+        path_to_call,
+        target,
+        isolation="rename",
+        expected=None,
+        explain=False,
+        batch_mode="statement",
+    ):
+        if isolation not in self.ISOLATION_MODES:
+            raise ValueError(
+                f"Isolation {isolation} is not one of {self.ISOLATION_MODES}"
+            )
+
         self.engine = engine
+        self.isolation = isolation
 
         # call __init__ of base class to initialize all other parameters
         # and to check if files provided in path variables exist
-        super().__init__(path_test_setup, path_to_call, target, engine)
+        super().__init__(
+            path_test_setup,
+            path_to_call,
+            target,
+            engine,
+            expected,
+            explain,
+            batch_mode,
+        )
 
         # create instances which include information about provided queries
         self.setup_properties = self._get_object_names_from_files(self.path_test_setup)
@@ -20,8 +93,8 @@ class DbSpecificTest(BaseTest):
 
     def _get_object_names_from_files(self, path):
 
-        if path.split(".")[-1] == "sql":
-            return SqlStatementProperties(self.read_sql_file(path))
+        if self._get_file_type(path) == "sql":
+            return statement_cache.get(path, _get_normalized_sql_properties)
         NotImplementedError("File type should be sql")
 
     @staticmethod
@@ -36,96 +109,161 @@ class DbSpecificTest(BaseTest):
         views = self.setup_properties.views + self.call_properties.views
         return list(set(tables + views))
 
-    @staticmethod
-    def _has_intersection(db_obj, query_obj):
-        """check if two lists have an intersection"""
-        for q_obj in query_obj:
-            if q_obj in db_obj:
-                return True
-
-        return False
-
     @staticmethod
     def read_sql_file(path, statement_separator=";", mapping_dict=None):
         """Read provided sql file"""
-        with open(path, "r") as file:
-            file_content = file.read()
-
-        # get rid of newlines
-        file_content = file_content.replace("\n", " ").lower()
+        if mapping_dict is None:
+            return list(
+                statement_cache.get(path, _split_normalized_sql, statement_separator)
+            )
 
-        if mapping_dict is not None:
-            for original_obj, test_obj in mapping_dict.items():
-                pattern = fr"\s{original_obj}\s"
-                new_name = " " + test_obj + " "
-                file_content = sub(pattern, new_name, file_content)
+        # get normalized file content and rename all objects
+        file_content = statement_cache.get(path, _normalize_sql)
+        file_content = transform_sql(
+            file_content, IdentifierRewriter(mapping_dict).rewrite
+        )
 
-        return file_content.split(statement_separator)
+        return split_statements(file_content, statement_separator)
 
     def execute_files(self, path_to_file, conn, mapping_dict=None):
         """Execute multiple sql statements"""
 
-        file_type = path_to_file.split(".")[-1]
+        file_type = self._get_file_type(path_to_file)
         if file_type == "sql":
             # read sql file
             statements = self.read_sql_file(path_to_file, mapping_dict=mapping_dict)
-
-            for statement in statements:
-                if len(statement.replace(" ", "")) > 0:
-                    conn.execute(statement)
+            self._execute_statements(conn, path_to_file, statements)
         else:
             raise TypeError(f"Execution of file type {file_type} is not implemented.")
 
-    def _get_test_table_mapping_info(self):
+    def _get_test_table_mapping_info(self, bind=None):
         """Get mapping information and ensure test table name is not equal to existing tables"""
+        # get all views and tables mentioned in query files
+        query_objects = self._get_all_query_objects()
+
         # make sure to proceed only if db objects with random suffix do not accidentally
         # exist in db
         while True:
             # get a random suffix for tables
             suffix = get_random_suffix(5)
 
-            # get all views and tables mentioned in query files
-            query_objects = self._get_all_query_objects()
-
             # create mapping dictionary for db objects
             mapping_dict = self._get_obj_mapping(suffix, query_objects)
 
-            # get database objects
-            db_objects = self._get_db_objects(self.engine)
-
-            # check that mapping_dict values are not already part of database
-            if not self._has_intersection(db_objects.tables, mapping_dict.values()):
+            # check with one catalog query that mapping_dict values are not
+            # already part of database
+            if not get_existing_object_names(
+                self.engine if bind is None else bind, mapping_dict.values()
+            ):
                 return mapping_dict, suffix
 
+    def _create_test_schema(self, conn):
+        """Create a temporary schema and use it as search_path"""
+        if conn.dialect.name != "postgresql":
+            raise NotImplementedError(
+                f"Schema isolation is not implemented for {conn.dialect.name}"
+            )
+
+        # make sure the schema does not accidentally exist in db
+        existing_schemas = inspect(conn).get_schema_names()
+        while True:
+            schema = "sql_testing_" + get_random_suffix(8)
+            if schema not in existing_schemas:
+                break
+
+        conn.execute(CreateSchema(schema))
+
+        # search_path is reset at the end of the transaction. public is kept
+        # to resolve functions, types and operators of extensions
+        quoted_schema = conn.dialect.identifier_preparer.quote_schema(schema)
+        conn.execute(text(f"SET LOCAL search_path TO {quoted_schema}, public"))
+
+        return schema
+
     @contextmanager
-    def run(self):
+    def _execute_test(self, budget=None):
+        """execute setup and call, yield connection and a table getter"""
 
-        # get mapping table names and related suffix
-        mapping_dict, suffix = self._get_test_table_mapping_info()
+        if self.isolation == "template":
+            # the setup is part of the copied template database, hence only
+            # the main sql statement has to be executed
+            template_cache = TemplateDatabaseCache(self.engine)
+            template = template_cache.get_template(
+                self.path_test_setup, self.read_sql_file(self.path_test_setup)
+            )
+            with template_cache.clone(template) as engine:
+                with self._run_files(engine, [self.path_to_call], budget) as test:
+                    yield test
+            return
+
+        with self._run_files(
+            self.engine, [self.path_test_setup, self.path_to_call], budget
+        ) as test:
+            yield test
+
+    @contextmanager
+    def _run_files(self, engine, paths_to_files, budget=None):
+        """execute files in a transaction, yield connection and a table getter
+
+        The table getter returns the test object of a table or view name of
+        the sql files, e.g. the renamed object. If a budget is provided the
+        call is measured before it is executed.
+        """
 
         # establish a connection by using a context manager to ensure the connection will be closed
         # after usage.
-        with self.engine.connect() as connection:
+        self.execution_report = ExecutionReport()
+        with engine.connect() as connection, self.execution_report.record(connection):
             # use connection to create a transaction object. This object is used for rollback at the end
             # as we don't want the test objects to pollute the database
             transaction = connection.begin()
 
-            # execute firstly multiple sql statements to setup testing and secondly
-            # the main sql statement
-            for paths in [self.path_test_setup, self.path_to_call]:
-                self.execute_files(
-                    conn=connection,
-                    path_to_file=paths,
-                    mapping_dict=mapping_dict,
-                )
-
-            # get target table instance
-            target_table_instance = self._get_db_obj_by_name(
-                connection, self.target.lower() + "_" + suffix
+            get_table, schema = self._execute_test_files(
+                connection, paths_to_files, budget
             )
 
-            # get all entries in table and yield the result
-            yield connection.execute(target_table_instance.select()).all()
+            yield connection, get_table
+
+            # drop all test objects at once
+            if schema is not None:
+                connection.execute(DropSchema(schema, cascade=True))
 
             # rollback transaction
             transaction.rollback()
+
+    def _execute_test_files(self, connection, paths_to_files, budget=None):
+        """isolate the test and execute files, get a table getter and the schema
+
+        The schema is the temporary schema of the schema isolation which has to
+        be dropped at the end of the test, otherwise None.
+        """
+        if self.isolation == "template":
+            # files are executed unmodified in a copy of a template database
+            mapping_dict, schema, suffix = None, None, None
+        elif self.isolation == "schema":
+            # files are executed unmodified in a temporary schema
+            mapping_dict, schema = None, self._create_test_schema(connection)
+            suffix = None
+        else:
+            # get mapping table names and related suffix
+            mapping_dict, suffix = self._get_test_table_mapping_info(connection)
+            schema = None
+
+        # execute firstly multiple sql statements to setup testing and secondly
+        # the main sql statement
+        for paths in paths_to_files:
+            if paths == self.path_to_call and budget is not None:
+                self._check_budget(connection, budget, mapping_dict)
+            self.execute_files(
+                conn=connection,
+                path_to_file=paths,
+                mapping_dict=mapping_dict,
+            )
+
+        def get_table(name):
+            name = name.lower()
+            if suffix is not None:
+                name = mapping_dict.get(name, name + "_" + suffix)
+            return self._get_db_obj_by_name(connection, name, schema)
+
+        return get_table, schema
@@ -0,0 +1,161 @@
+import csv
+import gzip
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+
+def _to_bool(value):
+    """convert a csv value like true, t, yes or 1 to a boolean"""
+    normalized = value.strip().lower()
+    if normalized in ("true", "t", "yes", "y", "1"):
+        return True
+    if normalized in ("false", "f", "no", "n", "0"):
+        return False
+    raise ValueError(f"{value} is not a boolean")
+
+
+def _infer(value):
+    """convert a csv value to int or float if possible"""
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+# conversions of csv values per type name
+COERCIONS = {
+    "int": int,
+    "float": float,
+    "decimal": Decimal,
+    "str": str,
+    "bool": _to_bool,
+    "date": date.fromisoformat,
+    "datetime": datetime.fromisoformat,
+}
+
+# conversions of csv values per python type of a sqlalchemy column type
+_TYPE_COERCIONS = {
+    int: int,
+    float: float,
+    Decimal: Decimal,
+    str: str,
+    bool: _to_bool,
+    date: date.fromisoformat,
+    datetime: datetime.fromisoformat,
+}
+
+
+def get_column_coercions(table_obj):
+    """Get a conversion of csv values per column of a table
+
+    :param table_obj: table or view, e.g. the target of a test
+    :return: dictionary with lower case column names as keys
+    """
+    coercions = {}
+    for col in table_obj.columns:
+        try:
+            python_type = col.type.python_type
+        except NotImplementedError:
+            # e.g. columns of views without a declared type
+            continue
+        if python_type in _TYPE_COERCIONS:
+            coercions[col.name.lower()] = _TYPE_COERCIONS[python_type]
+    return coercions
+
+
+def _get_coercion(coercion):
+    """get conversion function of a type name or a function"""
+    if callable(coercion):
+        return coercion
+    try:
+        return COERCIONS[coercion]
+    except KeyError:
+        raise ValueError(f"Unknown type {coercion}, use one of {list(COERCIONS)}")
+
+
+def read_expected_rows(path, column_types=None, batch_size=1000, table_obj=None):
+    """Read expected rows of a csv or parquet file lazily
+
+    Files are read in batches of batch_size rows, hence expected results
+    of any size can be compared with a streamed target. Csv files need a
+    header. Their values are converted per column: with the function or type
+    name of column_types, else to the type of the column of table_obj with
+    the same name, else to int or float if possible. An empty value
+    is read as NULL unless the column is converted to str. Values of parquet
+    files are typed already and only converted if a column is part of
+    column_types. Parquet files need pyarrow and are memory-mapped.
+
+    :param path: path to a .csv, .csv.gz or .parquet file
+    :param column_types: dictionary with column names as keys and functions or
+        names of COERCIONS as values
+    :param batch_size: number of rows read at once
+    :param table_obj: table, e.g. the target, whose column types are used to
+        convert csv values
+    :return: generator of rows
+    :raise ImportError: for parquet files if pyarrow is not installed
+    :raise TypeError: if the file type is not supported
+    """
+    coercions = {
+        name.lower(): _get_coercion(coercion)
+        for name, coercion in (column_types or {}).items()
+    }
+    path = str(path)
+
+    if path.endswith(".parquet"):
+        return _read_parquet_rows(path, coercions, batch_size)
+    if path.endswith((".csv", ".csv.gz")):
+        if table_obj is not None:
+            coercions = {**get_column_coercions(table_obj), **coercions}
+        return _read_csv_rows(path, coercions, batch_size)
+    raise TypeError(f"Expected results of file {path} are not supported")
+
+
+def _read_csv_rows(path, coercions, batch_size):
+    """read and convert rows of a csv file batch wise"""
+    open_file = gzip.open if path.endswith(".gz") else open
+    with open_file(path, "rt", newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        converters = [coercions.get(name.strip().lower(), _infer) for name in header]
+        nullable = [converter is not str for converter in converters]
+
+        while True:
+            batch = list(islice(reader, batch_size))
+            if not batch:
+                return
+            for row in batch:
+                yield tuple(
+                    None if is_nullable and value == "" else convert(value)
+                    for convert, is_nullable, value in zip(converters, nullable, row)
+                )
+
+
+def _read_parquet_rows(path, coercions, batch_size):
+    """read and convert rows of a memory-mapped parquet file batch wise"""
+    if pyarrow is None:
+        raise ImportError("pyarrow is required to read parquet files")
+
+    with pyarrow.memory_map(path) as source:
+        parquet_file = pyarrow.parquet.ParquetFile(source)
+        converters = [
+            coercions.get(name.lower()) for name in parquet_file.schema_arrow.names
+        ]
+
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            columns = [column.to_pylist() for column in batch.columns]
+            for index, convert in enumerate(converters):
+                if convert is not None:
+                    columns[index] = [
+                        None if value is None else convert(value)
+                        for value in columns[index]
+                    ]
+            yield from zip(*columns)
@@ -0,0 +1,49 @@
+import re
+
+from .sql_tokenizer import _STRING_PATTERN
+
+
+class IdentifierRewriter:
+    """Rename db objects in sql statements
+
+    All object names of the mapping dictionary are combined into one
+    compiled regular expression, hence the sql text is rewritten in a single
+    pass regardless of the number of objects. A name is only replaced if it
+    is not part of a longer identifier. Therefore names next to parentheses,
+    commas, double quotes or schema prefixes (e.g. schema.table) are renamed
+    as well. String literals and comments are matched by the same pattern
+    and kept unchanged, hence data equal to an object name is not renamed.
+
+    :param mapping_dict: dictionary with original names as keys and new names
+        as values
+    """
+
+    def __init__(self, mapping_dict):
+        self.mapping_dict = mapping_dict
+        self.pattern = self._compile_pattern(mapping_dict)
+
+    @staticmethod
+    def _compile_pattern(mapping_dict):
+        """compile one pattern which matches all object names and literals"""
+        if not mapping_dict:
+            return None
+
+        # longer names first to prefer e.g. schema.table over table
+        names = sorted(mapping_dict, key=len, reverse=True)
+        alternation = "|".join(re.escape(name) for name in names)
+        return re.compile(
+            rf"(?P<literal>{_STRING_PATTERN})|(?<![\w$])(?:{alternation})(?![\w$])",
+            re.S | re.X,
+        )
+
+    def _replace(self, match):
+        """get new name of a matched object, keep literals unchanged"""
+        if match.group("literal") is not None:
+            return match.group(0)
+        return self.mapping_dict[match.group(0)]
+
+    def rewrite(self, sql):
+        """Rename all objects in the provided sql text"""
+        if self.pattern is None:
+            return sql
+        return self.pattern.sub(self._replace, sql)
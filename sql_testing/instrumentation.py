@@ -0,0 +1,114 @@
+import json
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# timing of a statement, file and ordinal are None for statements which are
+# not part of a sql file, e.g. reflection queries
+StatementTiming = namedtuple(
+    "StatementTiming",
+    ["statement", "file", "ordinal", "duration", "rowcount", "plan"],
+    defaults=(None,),
+)
+
+
+class ExecutionReport:
+    """Timings of all statements executed on a connection
+
+    Statements are timed with the before_cursor_execute and
+    after_cursor_execute events of sqlalchemy, hence also statements which
+    are executed implicitly are recorded. Statements of sql files are
+    labeled with the file and the ordinal of the statement in the file.
+    """
+
+    def __init__(self):
+        self.timings = []
+        self._file = None
+        self._ordinal = None
+        self._plan = None
+        self._start = None
+        self._paused = False
+
+    @contextmanager
+    def record(self, conn):
+        """Record all statements executed on a connection"""
+        event.listen(conn, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(conn, "after_cursor_execute", self._after_cursor_execute)
+        try:
+            yield self
+        finally:
+            event.remove(conn, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(conn, "after_cursor_execute", self._after_cursor_execute)
+
+    @contextmanager
+    def statement(self, file, ordinal, plan=None):
+        """Label all statements executed inside with a file and an ordinal"""
+        self._file, self._ordinal, self._plan = file, ordinal, plan
+        try:
+            yield
+        finally:
+            self._file, self._ordinal, self._plan = None, None, None
+
+    @contextmanager
+    def paused(self):
+        """Do not record statements executed inside, e.g. EXPLAIN statements"""
+        paused, self._paused = self._paused, True
+        try:
+            yield
+        finally:
+            self._paused = paused
+
+    def _before_cursor_execute(self, conn, cursor, statement, *args):
+        self._start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, *args):
+        if self._paused or self._start is None:
+            return
+        self.timings.append(
+            StatementTiming(
+                statement,
+                self._file,
+                self._ordinal,
+                time.perf_counter() - self._start,
+                cursor.rowcount,
+                self._plan,
+            )
+        )
+        self._start = None
+
+    @property
+    def total_time(self):
+        """Get duration of all recorded statements in seconds"""
+        return sum(timing.duration for timing in self.timings)
+
+    def slowest(self, n=5):
+        """Get the n slowest statements"""
+        return sorted(self.timings, key=lambda timing: timing.duration)[::-1][:n]
+
+    def to_dict(self):
+        """Get report as dictionary"""
+        return {
+            "total_time": self.total_time,
+            "statements": [timing._asdict() for timing in self.timings],
+        }
+
+    def to_json(self, path=None):
+        """Get report as json and store it if a path is provided"""
+        report = json.dumps(self.to_dict(), indent=2, default=str)
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(report)
+        return report
+
+    def summary(self, n=5):
+        """Get a human readable summary of the slowest statements"""
+        lines = [f"{len(self.timings)} statements in {self.total_time:.4f}s, slowest:"]
+        for timing in self.slowest(n):
+            location = (
+                f"{timing.file}:{timing.ordinal}" if timing.file else "<internal>"
+            )
+            statement = " ".join(timing.statement.split())[:80]
+            lines.append(f"  {timing.duration:.4f}s {location} {statement}")
+        return "\n".join(lines)
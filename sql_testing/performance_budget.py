@@ -0,0 +1,176 @@
+import json
+import math
+import os
+import statistics
+from threading import Lock
+
+# baseline files can be updated by tests running in parallel threads
+_baseline_lock = Lock()
+
+
+class BudgetResult:
+    """Outcome of the check of a performance budget
+
+    :param time: measured time of the call in seconds (median or p95)
+    :param times: times of all measured executions
+    :param cost: total cost of the call estimated by the planner
+    :param buffers: number of buffers read by the call
+    :param baseline: baseline time of the call in seconds
+    :param violations: descriptions of all exceeded limits
+    """
+
+    def __init__(self, time, times, cost, buffers, baseline, violations):
+        self.time = time
+        self.times = times
+        self.cost = cost
+        self.buffers = buffers
+        self.baseline = baseline
+        self.violations = violations
+
+    @property
+    def passed(self):
+        """Check if no limit of the budget was exceeded"""
+        return not self.violations
+
+    def summary(self):
+        """Get a human readable summary of the check"""
+        lines = [f"time: {self.time:.4f}s of {len(self.times)} executions"]
+        if self.baseline is not None:
+            lines.append(f"baseline: {self.baseline:.4f}s")
+        if self.cost is not None:
+            lines.append(f"cost: {self.cost}")
+        if self.buffers is not None:
+            lines.append(f"buffers read: {self.buffers}")
+        lines.extend(f"  exceeded: {violation}" for violation in self.violations)
+        return "\n".join(lines)
+
+    def __repr__(self):
+        status = "passed" if self.passed else f"{len(self.violations)} violations"
+        return f"BudgetResult({self.time:.4f}s, {status})"
+
+
+class PerformanceBudget:
+    """Limits for the execution of the call under test
+
+    The call is executed warmup + iterations times inside of savepoints
+    which are rolled back, the median or 95th percentile of the measured
+    times is compared with the limits. Planner costs and read buffers are
+    taken from EXPLAIN (ANALYZE, BUFFERS) of the call, hence they are only
+    available for postgresql. Statements without a plan, e.g. CREATE VIEW,
+    are ignored.
+
+    Baselines are stored per call in a json file. If the file has no
+    baseline for a call the measured time is stored as new baseline.
+
+    :param max_time: maximal time of the call in seconds
+    :param max_cost: maximal total cost estimated by the planner
+    :param max_buffers: maximal number of shared buffers read
+    :param max_regression: maximal percentage the call may be slower than its
+        baseline, e.g. 10 for 10%
+    :param baseline: path to a json file with baseline times
+    :param warmup: number of executions which are not measured
+    :param iterations: number of measured executions
+    :param statistic: statistic of the measured times, "median" or "p95"
+    """
+
+    STATISTICS = ("median", "p95")
+
+    def __init__(
+        self,
+        max_time=None,
+        max_cost=None,
+        max_buffers=None,
+        max_regression=None,
+        baseline=None,
+        warmup=1,
+        iterations=5,
+        statistic="median",
+    ):
+        if statistic not in self.STATISTICS:
+            raise ValueError(f"Statistic {statistic} is not one of {self.STATISTICS}")
+        if iterations < 1:
+            raise ValueError("At least one iteration is required")
+        if max_regression is not None and baseline is None:
+            raise ValueError("A baseline file is required for max_regression")
+
+        self.max_time = max_time
+        self.max_cost = max_cost
+        self.max_buffers = max_buffers
+        self.max_regression = max_regression
+        self.baseline = baseline
+        self.warmup = warmup
+        self.iterations = iterations
+        self.statistic = statistic
+
+    @property
+    def needs_plans(self):
+        """Check if query plans of the call are required"""
+        return self.max_cost is not None or self.max_buffers is not None
+
+    def get_time(self, times):
+        """Get median or 95th percentile (nearest rank) of measured times"""
+        if self.statistic == "median":
+            return statistics.median(times)
+        return sorted(times)[math.ceil(0.95 * len(times)) - 1]
+
+    @staticmethod
+    def _sum_plan_values(plans, key):
+        """sum a value of the top nodes of postgresql json plans"""
+        return sum(plan[0]["Plan"].get(key, 0) for plan in plans if plan is not None)
+
+    def load_baseline(self, key):
+        """Get the stored baseline time of a call, None if there is none"""
+        if self.baseline is None or not os.path.isfile(self.baseline):
+            return None
+        with open(self.baseline) as file:
+            return json.load(file).get(key)
+
+    def store_baseline(self, key, value):
+        """Store the baseline time of a call"""
+        with _baseline_lock:
+            baselines = {}
+            if os.path.isfile(self.baseline):
+                with open(self.baseline) as file:
+                    baselines = json.load(file)
+            baselines[key] = value
+            with open(self.baseline, "w") as file:
+                json.dump(baselines, file, indent=2, sort_keys=True)
+
+    def check(self, times, plans=(), key=None):
+        """Check measured times and plans of a call against the budget
+
+        :param times: times of the measured executions in seconds
+        :param plans: postgresql json plans of the statements of the call
+        :param key: key of the call in the baseline file
+        :return: BudgetResult
+        """
+        time = self.get_time(times)
+        violations = []
+
+        if self.max_time is not None and time > self.max_time:
+            violations.append(f"time {time:.4f}s > {self.max_time:.4f}s")
+
+        cost, buffers = None, None
+        if self.max_cost is not None:
+            cost = self._sum_plan_values(plans, "Total Cost")
+            if cost > self.max_cost:
+                violations.append(f"cost {cost} > {self.max_cost}")
+        if self.max_buffers is not None:
+            buffers = self._sum_plan_values(plans, "Shared Read Blocks")
+            if buffers > self.max_buffers:
+                violations.append(f"buffers read {buffers} > {self.max_buffers}")
+
+        baseline = None
+        if self.baseline is not None:
+            baseline = self.load_baseline(key)
+            if baseline is None:
+                self.store_baseline(key, time)
+            elif self.max_regression is not None:
+                limit = baseline * (1 + self.max_regression / 100)
+                if time > limit:
+                    violations.append(
+                        f"time {time:.4f}s > {limit:.4f}s "
+                        f"({self.max_regression}% above baseline)"
+                    )
+
+        return BudgetResult(time, times, cost, buffers, baseline, violations)
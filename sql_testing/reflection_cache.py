@@ -0,0 +1,150 @@
+import time
+from threading import Lock
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import MetaData, Table, bindparam, inspect, text
+from sqlalchemy.engine import Engine
+
+# queries which search tables and views by a list of lower case names
+_CATALOG_QUERIES = {
+    "sqlite": "SELECT name FROM sqlite_master "
+    "WHERE type IN ('table', 'view') AND lower(name) IN :names",
+    "oracle": "SELECT object_name FROM all_objects "
+    "WHERE object_type IN ('TABLE', 'VIEW') AND lower(object_name) IN :names",
+    "information_schema": "SELECT table_name FROM information_schema.tables "
+    "WHERE lower(table_name) IN :names",
+}
+
+
+class ReflectionCache:
+    """Per engine cache of reflected db objects
+
+    Reflecting the whole database with MetaData.reflect() is slow for
+    schemas with thousands of tables. The cache reflects only the objects
+    which are requested and stores them per engine. Entries expire after
+    ttl seconds and have to be invalidated explicitly after DDL statements
+    which change them.
+
+    :param ttl: time in seconds after which cached entries expire
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = WeakKeyDictionary()
+        self._lock = Lock()
+
+    @staticmethod
+    def _get_engine(bind):
+        """get engine of a connection or engine"""
+        return getattr(bind, "engine", bind)
+
+    def _get(self, bind, key, reflect):
+        """get cached entry or reflect it if it is missing or expired"""
+        engine = self._get_engine(bind)
+
+        with self._lock:
+            entries = self._entries.setdefault(engine, {})
+            entry = entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                return entry[1]
+
+        value = reflect()
+
+        with self._lock:
+            entries[key] = (time.monotonic(), value)
+
+        return value
+
+    def get_table(self, bind, name, schema=None):
+        """Get a table or view, only this object will be reflected
+
+        :param bind: engine or connection to use for reflection
+        :param name: name of table or view
+        :param schema: schema of table or view
+        :raise NoSuchTableError: if object does not exist
+        """
+        return self._get(
+            bind,
+            ("table", schema, name),
+            lambda: reflect_table(bind, name, schema),
+        )
+
+    def get_object_names(self, bind, schema=None):
+        """Get names of all tables and views without reflecting them"""
+
+        def reflect():
+            inspector = inspect(bind)
+            return set(inspector.get_table_names(schema)) | set(
+                inspector.get_view_names(schema)
+            )
+
+        return self._get(bind, ("names", schema), reflect)
+
+    def invalidate(self, bind=None, name=None, schema=None):
+        """Invalidate cached entries
+
+        Without a bind the whole cache is cleared. Without a name all entries
+        of the engine are removed, otherwise only the entries of this object
+        and the cached object names.
+        """
+        with self._lock:
+            if bind is None:
+                self._entries.clear()
+                return
+
+            entries = self._entries.get(self._get_engine(bind), {})
+            if name is None:
+                entries.clear()
+                return
+
+            entries.pop(("table", schema, name), None)
+            entries.pop(("names", schema), None)
+
+
+def reflect_table(bind, name, schema=None):
+    """Reflect a single table or view without using the cache"""
+    return Table(name, MetaData(), autoload_with=bind, schema=schema)
+
+
+def get_existing_object_names(bind, names):
+    """Get all names which already exist as table or view in the database
+
+    Only the provided names are searched with a single catalog query, hence
+    the costs do not depend on the size of the schema. Schema prefixes of
+    names are ignored and names are compared case insensitive, so the result
+    can contain more names than really collide.
+
+    :param bind: engine or connection to use
+    :param names: names of tables or views
+    :return: set of lower case names which exist in the database
+    """
+    candidates = {name.split(".")[-1].lower(): name for name in names}
+    if not candidates:
+        return set()
+
+    dialect = bind.dialect.name
+    if dialect in _CATALOG_QUERIES:
+        query = _CATALOG_QUERIES[dialect]
+    elif dialect in ("postgresql", "mysql", "mariadb", "mssql"):
+        query = _CATALOG_QUERIES["information_schema"]
+    else:
+        # fall back to one lookup per name for all other dialects
+        inspector = inspect(bind)
+        return {name for name in candidates if inspector.has_table(name)}
+
+    query = text(query).bindparams(bindparam("names", expanding=True))
+    if isinstance(bind, Engine):
+        with bind.connect() as conn:
+            rows = conn.execute(query, {"names": list(candidates)}).all()
+    else:
+        rows = bind.execute(query, {"names": list(candidates)}).all()
+
+    return {row[0].lower() for row in rows}
+
+
+reflection_cache = ReflectionCache()
+
+
+def invalidate(bind=None, name=None, schema=None):
+    """Invalidate cached entries of the reflection cache"""
+    reflection_cache.invalidate(bind, name, schema)
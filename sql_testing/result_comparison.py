@@ -0,0 +1,214 @@
+from collections import Counter, namedtuple
+from itertools import zip_longest
+
+from sqlalchemy import except_all, func, select
+
+from .utils import get_batches
+
+# a differing row, position is None for unordered comparisons and count is
+# the number of missing or unexpected copies of a row
+RowDifference = namedtuple("RowDifference", ["position", "expected", "actual", "count"])
+
+# dialects which support EXCEPT ALL
+_EXCEPT_ALL_DIALECTS = {"postgresql"}
+
+
+class ComparisonResult:
+    """Outcome of a comparison of expected and actual rows
+
+    :param expected_count: number of expected rows
+    :param actual_count: number of actual rows
+    :param differences: first differing rows as list of RowDifference
+    :param n_differences: number of all differing rows
+    :param ordered: whether the order of rows was compared
+    """
+
+    def __init__(
+        self, expected_count, actual_count, differences, n_differences, ordered
+    ):
+        self.expected_count = expected_count
+        self.actual_count = actual_count
+        self.differences = differences
+        self.n_differences = n_differences
+        self.ordered = ordered
+
+    @property
+    def passed(self):
+        """Check if expected and actual rows are equal"""
+        return self.n_differences == 0 and self.expected_count == self.actual_count
+
+    def summary(self):
+        """Get a human readable summary of the comparison"""
+        if self.passed:
+            return f"{self.actual_count} rows are equal"
+
+        lines = [
+            f"Expected {self.expected_count} rows, got {self.actual_count} rows, "
+            f"{self.n_differences} rows differ"
+        ]
+        for diff in self.differences:
+            if diff.position is not None:
+                lines.append(
+                    f"  row {diff.position}: expected {diff.expected}, "
+                    f"got {diff.actual}"
+                )
+            elif diff.actual is None:
+                lines.append(f"  missing {diff.count}x: {diff.expected}")
+            else:
+                lines.append(f"  unexpected {diff.count}x: {diff.actual}")
+        if self.n_differences > len(self.differences):
+            lines.append(f"  ... {self.n_differences - len(self.differences)} more")
+        return "\n".join(lines)
+
+    def __repr__(self):
+        status = "passed" if self.passed else f"{self.n_differences} rows differ"
+        return (
+            f"ComparisonResult({self.expected_count} expected, "
+            f"{self.actual_count} actual, {status})"
+        )
+
+
+def _get_key(row):
+    """get a hashable key of a row, equal rows get equal keys"""
+    try:
+        hash(row)
+        return row
+    except TypeError:
+        # e.g. rows with lists of json columns
+        return repr(row)
+
+
+def compare_rows(expected, actual, ordered=True, max_differences=10, chunk_size=1000):
+    """Compare expected and actual rows
+
+    Both sides are consumed as streams, hence e.g. a streamed result of a
+    large target table is never loaded into memory at once. An ordered
+    comparison compares the rows position by position. An unordered
+    comparison compares the rows as multisets. Both sides are read
+    alternately in chunks and every row is hashed into a counter, rows which
+    are found on both sides are removed, hence only unmatched rows are kept
+    in memory.
+
+    :param expected: iterable of expected rows
+    :param actual: iterable of actual rows, e.g. a streamed result
+    :param ordered: whether the order of rows has to be equal
+    :param max_differences: maximal number of reported differing rows
+    :param chunk_size: number of rows read from one side at once
+    :return: ComparisonResult
+    """
+    if ordered:
+        return _compare_ordered_rows(expected, actual, max_differences)
+
+    counts = Counter()
+    rows = {}
+    expected_count = actual_count = 0
+
+    for expected_chunk, actual_chunk in zip_longest(
+        get_batches(expected, chunk_size), get_batches(actual, chunk_size)
+    ):
+        for chunk, sign in ((expected_chunk or [], 1), (actual_chunk or [], -1)):
+            for row in chunk:
+                row = tuple(row)
+                key = _get_key(row)
+                counts[key] += sign
+                if counts[key] == 0:
+                    del counts[key]
+                    rows.pop(key, None)
+                else:
+                    rows.setdefault(key, row)
+        expected_count += len(expected_chunk or [])
+        actual_count += len(actual_chunk or [])
+
+    differences = [
+        (
+            RowDifference(None, rows[key], None, count)
+            if count > 0
+            else RowDifference(None, None, rows[key], -count)
+        )
+        for key, count in counts.items()
+    ]
+    return ComparisonResult(
+        expected_count,
+        actual_count,
+        differences[:max_differences],
+        sum(abs(count) for count in counts.values()),
+        ordered=False,
+    )
+
+
+def _compare_ordered_rows(expected, actual, max_differences):
+    """compare rows position by position"""
+    differences = []
+    n_differences = expected_count = actual_count = 0
+    missing = object()
+
+    for position, (exp, act) in enumerate(
+        zip_longest(expected, actual, fillvalue=missing)
+    ):
+        exp = None if exp is missing else tuple(exp)
+        act = None if act is missing else tuple(act)
+        expected_count += exp is not None
+        actual_count += act is not None
+
+        if exp != act:
+            n_differences += 1
+            if len(differences) < max_differences:
+                differences.append(RowDifference(position, exp, act, 1))
+
+    return ComparisonResult(
+        expected_count, actual_count, differences, n_differences, ordered=True
+    )
+
+
+def supports_except_all(dialect):
+    """Check if a dialect supports EXCEPT ALL"""
+    return dialect.name in _EXCEPT_ALL_DIALECTS
+
+
+def compare_tables(conn, expected_table, actual_table, max_differences=10):
+    """Compare the rows of two tables or views as multisets
+
+    If the database supports EXCEPT ALL the difference is computed in the
+    database and only the first differing rows are transferred. Otherwise
+    both tables are streamed and compared with compare_rows.
+
+    :param conn: connection to use
+    :param expected_table: table or view with expected rows
+    :param actual_table: table or view with actual rows
+    :param max_differences: maximal number of reported differing rows
+    :return: ComparisonResult
+    """
+    expected_select = select(*expected_table.columns)
+    actual_select = select(*actual_table.columns)
+
+    if not supports_except_all(conn.dialect):
+        stream = conn.execution_options(stream_results=True)
+        return compare_rows(
+            stream.execute(expected_select),
+            stream.execute(actual_select),
+            ordered=False,
+            max_differences=max_differences,
+        )
+
+    def count(selectable):
+        return conn.execute(select(func.count()).select_from(selectable)).scalar()
+
+    missing = except_all(expected_select, actual_select)
+    unexpected = except_all(actual_select, expected_select)
+
+    differences = []
+    for diff_select, is_missing in ((missing, True), (unexpected, False)):
+        rows = conn.execute(diff_select.limit(max_differences)).all()
+        for row, row_count in Counter(tuple(row) for row in rows).items():
+            if is_missing:
+                differences.append(RowDifference(None, row, None, row_count))
+            else:
+                differences.append(RowDifference(None, None, row, row_count))
+
+    return ComparisonResult(
+        count(expected_table),
+        count(actual_table),
+        differences[:max_differences],
+        count(missing.subquery()) + count(unexpected.subquery()),
+        ordered=False,
+    )
@@ -0,0 +1,141 @@
+import time
+from contextlib import contextmanager
+
+from .bulk_loader import execute_statement
+from .db_specific_test import DbSpecificTest, _get_normalized_sql_properties
+from .reflection_cache import get_existing_object_names
+from .statement_cache import statement_cache
+from .utils import get_random_suffix
+
+
+class SharedFixture:
+    """Execute a test setup once and test many calls against it
+
+    The setup file is executed once inside an outer transaction. Every call
+    is executed inside a savepoint which is rolled back afterwards, hence
+    all calls see the unmodified setup and the costs of a test are only the
+    costs of the call under test. Like DbSpecificTest all objects are
+    renamed with a random suffix and the outer transaction is rolled back
+    at the end.
+
+    :Example:
+
+        fixture = SharedFixture(engine, "setup.sql")
+        with fixture.setup():
+            with fixture.run("call_1.sql", "target_1") as result:
+                ...
+            with fixture.run("call_2.sql", "target_2") as result:
+                ...
+        print(fixture.report())
+
+    :param engine: engine to use
+    :param path_test_setup: path to test setup with sql statements
+    """
+
+    def __init__(self, engine, path_test_setup):
+        self.engine = engine
+        self.path_test_setup = path_test_setup
+        self.setup_time = None
+        self.call_times = []
+
+        self._connection = None
+        self._suffix = None
+        self._mapping_dict = None
+
+    def _get_mapping_info(self, objects):
+        """get a suffix which does not collide with existing db objects"""
+        while True:
+            suffix = get_random_suffix(5)
+            mapping_dict = DbSpecificTest._get_obj_mapping(suffix, objects)
+            if not get_existing_object_names(self.engine, mapping_dict.values()):
+                return mapping_dict, suffix
+
+    def _extend_mapping(self, objects):
+        """add objects of a call to the mapping by using the fixture suffix"""
+        new_objects = [obj for obj in objects if obj not in self._mapping_dict]
+        new_mapping = DbSpecificTest._get_obj_mapping(self._suffix, new_objects)
+
+        if get_existing_object_names(self._connection, new_mapping.values()):
+            raise RuntimeError(
+                f"Objects {list(new_mapping.values())} already exist in database"
+            )
+
+        return {**self._mapping_dict, **new_mapping}
+
+    @contextmanager
+    def setup(self):
+        """Execute the setup file once and keep the transaction open"""
+        setup_properties = statement_cache.get(
+            self.path_test_setup, _get_normalized_sql_properties
+        )
+        self._mapping_dict, self._suffix = self._get_mapping_info(
+            set(setup_properties.tables + setup_properties.views)
+        )
+        self.call_times = []
+
+        with self.engine.connect() as connection:
+            # outer transaction which is rolled back at the end
+            transaction = connection.begin()
+
+            start = time.perf_counter()
+            for statement in DbSpecificTest.read_sql_file(
+                self.path_test_setup, mapping_dict=self._mapping_dict
+            ):
+                if len(statement.strip()) > 0:
+                    execute_statement(connection, statement)
+            self.setup_time = time.perf_counter() - start
+
+            self._connection = connection
+            yield self
+            self._connection = None
+
+            # rollback transaction
+            transaction.rollback()
+
+    @contextmanager
+    def run(self, path_to_call, target):
+        """Execute a call against the shared setup and yield the target rows"""
+        if self._connection is None:
+            raise RuntimeError("Calls can only be run inside of setup()")
+
+        call_test = DbSpecificTest(
+            self.engine, self.path_test_setup, path_to_call, target
+        )
+        mapping_dict = self._extend_mapping(call_test._get_all_query_objects())
+
+        # savepoint which is rolled back after the call, even if it fails
+        savepoint = self._connection.begin_nested()
+        try:
+            start = time.perf_counter()
+            call_test.execute_files(
+                conn=self._connection,
+                path_to_file=path_to_call,
+                mapping_dict=mapping_dict,
+            )
+            self.call_times.append(time.perf_counter() - start)
+
+            # get target table instance
+            target_table_instance = call_test._get_db_obj_by_name(
+                self._connection, target.lower() + "_" + self._suffix
+            )
+
+            # get all entries in table and yield the result
+            yield self._connection.execute(target_table_instance.select()).all()
+        finally:
+            # rollback to the state after the setup
+            savepoint.rollback()
+
+    @property
+    def amortized_setup_time(self):
+        """Get setup time saved compared to one setup execution per call"""
+        if self.setup_time is None or not self.call_times:
+            return 0.0
+        return self.setup_time * (len(self.call_times) - 1)
+
+    def report(self):
+        """Get a human readable summary of setup and call times"""
+        return (
+            f"setup: {self.setup_time or 0.0:.4f}s, "
+            f"{len(self.call_times)} calls: {sum(self.call_times):.4f}s, "
+            f"amortized setup time: {self.amortized_setup_time:.4f}s"
+        )
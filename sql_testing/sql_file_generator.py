@@ -1,45 +1,220 @@
+import gzip
+import hashlib
+import json
 import logging
+import os
 import random
+import shutil
+import tempfile
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import ExitStack, contextmanager, nullcontext
+from copy import deepcopy
+from functools import partial
 from pathlib import Path
 
 import sqlalchemy
 import yaml
-from sqlalchemy import Column, MetaData, Table, insert
+from sqlalchemy import Column, MetaData, Table, Text, cast, func, literal
 from sqlalchemy.schema import CreateTable
 
-from .utils import get_random_list, get_random_suffix
+from .bulk_loader import (
+    COPY_END,
+    format_copy_rows,
+    get_copy_statement,
+    load_rows,
+)
+from .reflection_cache import reflection_cache
+from .statement_cache import statement_cache
+from .utils import (
+    derive_seed,
+    get_batches,
+    get_random_array,
+    get_random_list,
+    get_random_suffix,
+    get_rng,
+)
+
+
+def _render_temporal_literal(value):
+    """render a date, time or datetime as iso formatted string literal"""
+    return f"'{value}'"
+
+
+def _generate_columns(generator, column_configs, n_rows, seed):
+    """generate the values of all columns of a table, runs in worker processes"""
+    rng = get_rng(generator, seed)
+    get_values = SqlFileGenerator.GENERATORS[generator]
+    return [get_values(config, n_rows, rng) for config in column_configs]
+
+
+def _compile_literal(value, dialect, type_):
+    """render a value of a specific type as sql literal"""
+    compiled = literal(value, type_).compile(
+        dialect=dialect, compile_kwargs={"literal_binds": True}
+    )
+    return str(compiled)
 
 
 class SqlFileGenerator:
-    def __init__(self, engine, path_test_setup):
+    """Class for generating sql setup files
+
+    Class takes a yaml file which describes tables of a test setup and
+    generates a sql file with the same name. New tables are filled with
+    random data, existing tables are copied from the database. Random data
+    is generated with python lists by default. For large tables numpy can be
+    selected by setting ``generator: numpy`` at the top of the yaml file or
+    for a single table. A column with ``references: table.column`` draws its
+    values from a column of a table defined before it in the yaml file,
+    hence joins between generated tables return rows.
+
+    A ``seed`` at the top of the yaml file or for a single table makes the
+    generated file reproducible. Every table gets its own random stream
+    derived from the seed and the table name, hence tables can be generated
+    in parallel worker processes and the output is always byte-identical.
+
+    Rows are stored as multi-row INSERT statements or, with output_format
+    copy, as ``COPY ... FROM stdin`` blocks which postgresql loads much
+    faster. Generated rows are loaded into the database with COPY if the
+    dialect supports it and with batched inserts otherwise.
+
+    With connections, tables are created concurrently, each in its own
+    transaction on a connection of the engine. A table which references
+    other tables is started as soon as they are done. Every table is written
+    to its own temporary fragment and the fragments are concatenated in the
+    order of the yaml file, hence the output equals the sequential output.
+    As every table uses its own connection, connections are not useful for
+    sqlite, where in-memory databases are not shared between threads and
+    writers are serialized.
+
+    With a cache_dir the fragments are kept per table and keyed by a hash of
+    the yaml block of the table, the generator settings, the schema of
+    copied tables and the keys of referenced tables. Only tables whose
+    inputs changed (and the tables they reference) are created again, all
+    other tables are taken from the cache. An unseeded table gets new values
+    whenever it is created, hence all tables referencing it are created
+    again as well. The created tables are stored in
+    created_tables.
+
+    :param engine: engine to use
+    :param path_test_setup: path to yaml file with table specifications
+    :param batch_size: number of rows per insert statement
+    :param compress: whether to store a gzip compressed .sql.gz file
+    :param processes: number of worker processes which generate random data of
+        tables without references, None to generate all data in this process
+    :param output_format: format of stored rows, either "insert" or "copy"
+    :param connections: number of connections which create tables
+        concurrently, None to create all tables on a single connection
+    :param cache_dir: directory with cached fragments of tables for
+        incremental generation, None to create all tables
+    """
+
+    GENERATORS = {"python": get_random_list, "numpy": get_random_array}
+    OUTPUT_FORMATS = ("insert", "copy")
+
+    def __init__(
+        self,
+        engine,
+        path_test_setup,
+        batch_size=1000,
+        compress=False,
+        processes=None,
+        output_format="insert",
+        connections=None,
+        cache_dir=None,
+    ):
+        if output_format not in self.OUTPUT_FORMATS:
+            raise ValueError(
+                f"Output format {output_format} is not one of {self.OUTPUT_FORMATS}"
+            )
+
         self.engine = engine
         self.path_test_setup = path_test_setup
+        self.batch_size = batch_size
+        self.compress = compress
+        self.processes = processes
+        self.output_format = output_format
+        self.connections = connections
+        self.cache_dir = cache_dir
+        self.created_tables = []
         # self.mapping_dict = {}  # self._get_test_table_mapping_info()
-        self.string_to_store = ""
+        self.generator = "python"
+        self.seed = None
+        self._output = None
+        # fragment the current thread writes to if tables are created concurrently
+        self._local = threading.local()
+        self._referenced_values = {}
 
     @staticmethod
     def read_yaml_file(path):
         """Read provided yaml file"""
 
-        with open(path, "r") as stream:
-            setup_config = yaml.safe_load(stream)
-
-        return setup_config
+        # copy the cached config as it is a mutable dictionary
+        return deepcopy(statement_cache.get(path, yaml.safe_load))
 
     def generate_sql_file(self):
         """Generate sql file via yaml file"""
 
-        with self.engine.connect() as connection:
+        with self._open_output_file(), self.engine.connect() as connection:
             # use connection to create a transaction object. This object is used for rollback at the end
             # as we don't want the test objects to pollute the database
             transaction = connection.begin()
 
             config = self.read_yaml_file(self.path_test_setup)
+            self.generator = config.get("generator", self.generator)
+            self.seed = config.get("seed", self.seed)
             self.create_tables_from_yaml(connection, config.get("tables"))
 
             transaction.rollback()
 
-        self._store_stmt_in_sql_file(self.path_test_setup, self.string_to_store)
+    @property
+    def path_sql_file(self):
+        """Get path of the generated sql file"""
+        # change suffix as we want to store in a .sql file
+        path = Path(self.path_test_setup)
+        suffix = ".sql.gz" if self.compress else ".sql"
+        return path.parent / (path.stem + suffix)
+
+    @contextmanager
+    def _open_output_file(self):
+        """Open the sql file all statements are streamed to
+
+        Statements are written to a temporary file which replaces the sql
+        file only if the generation succeeds, hence a failed generation
+        keeps the former file instead of leaving a partial setup.
+        """
+        path = self.path_sql_file
+        path_tmp = path.with_name(path.name + ".tmp")
+
+        if self.compress:
+            file = gzip.open(path_tmp, "wt")
+        else:
+            file = open(path_tmp, "w", buffering=2**16)
+
+        self._output = file
+        try:
+            with file:
+                yield file
+        except BaseException:
+            path_tmp.unlink()
+            raise
+        finally:
+            self._output = None
+
+        os.replace(path_tmp, path)
+
+        # make sure tests read the newly generated file
+        statement_cache.invalidate(path)
+
+    def _store_statement(self, statement):
+        """Write a statement to the sql file or the fragment of a table"""
+        fragment = getattr(self._local, "fragment", None)
+        (self._output if fragment is None else fragment).write(statement)
 
     def _get_test_table_mapping_info(self):
         """Get mapping information and ensure test table name is not equal to existing tables"""
@@ -65,140 +240,611 @@ class SqlFileGenerator:
     def create_tables_from_yaml(self, conn, table_config):
         """Create tables from yaml config"""
 
-        for key, val in table_config.items():
+        # store results in sql file if it is not already opened
+        if self._output is None:
+            with self._open_output_file():
+                return self.create_tables_from_yaml(conn, table_config)
+
+        # values of referenced columns are kept for the referencing tables
+        self._referenced_values = {
+            column_config["references"]: None
+            for val in table_config.values()
+            for column_config in (val.get("column_names") or {}).values()
+            if column_config.get("references")
+        }
+
+        # in incremental mode only tables with changed inputs are created
+        fragment_keys = {}
+        tables = list(table_config)
+        if self.cache_dir is not None:
+            fragment_keys = self._get_fragment_keys(conn, table_config)
+            tables = self._get_outdated_tables(table_config, fragment_keys)
+        self.created_tables = tables
+
+        executor = ProcessPoolExecutor(self.processes) if self.processes else None
+        with executor or nullcontext():
+            # start generating all tables without references in the workers,
+            # tables are still created and stored in the order of the yaml file
+            generated_columns = {}
+            if executor is not None:
+                for key in tables:
+                    val = table_config[key]
+                    if not val.get("exists") and not self._has_references(val):
+                        generated_columns[key] = executor.submit(
+                            _generate_columns,
+                            self._get_generator(val),
+                            list(val.get("column_names").values()),
+                            val.get("number_of_rows"),
+                            self._get_table_seed(key, val),
+                        )
+
+            if not self.connections and self.cache_dir is None:
+                # write all tables directly into the sql file
+                for key in tables:
+                    self._create_table(
+                        conn, key, table_config[key], generated_columns.get(key)
+                    )
+                return
+
+            # write every table into its own fragment and concatenate them
+            with ExitStack() as stack:
+                fragments = {
+                    key: stack.enter_context(tempfile.TemporaryFile("w+"))
+                    for key in tables
+                }
+                if self.connections:
+                    self._create_tables_concurrently(
+                        tables, table_config, generated_columns, fragments
+                    )
+                else:
+                    for key in tables:
+                        self._create_table_fragment(
+                            fragments[key],
+                            key,
+                            table_config[key],
+                            generated_columns.get(key),
+                            conn,
+                        )
+
+                if self.cache_dir is not None:
+                    self._store_fragments(fragments, fragment_keys)
+                self._concatenate_fragments(table_config, fragments, fragment_keys)
+
+    def _create_table(self, conn, table_name, table_config, generated_columns=None):
+        """copy an existing table or create a new table with random data"""
+
+        # copy an existing structure if flag exists is set to True
+        if table_config.get("exists"):
+
+            # get table object we want to copy. Use a copy of the cached
+            # table as constraints will be renamed
+            table_obj = reflection_cache.get_table(conn, table_name).to_metadata(
+                MetaData()
+            )
 
-            # copy an existing structure if flag exists is set to True
-            if val.get("exists"):
+            self._copy_existing_table(
+                conn,
+                table_obj,
+                table_config.get("number_of_rows"),
+                self._get_table_seed(table_name, table_config),
+            )
 
-                # get table object we want to copy
-                table_obj = self._get_meta_data(conn).tables[key]
+        else:
+            self._create_new_table(
+                conn,
+                table_name,
+                table_config,
+                table_config.get("number_of_rows"),
+                generated_columns,
+            )
 
-                self._copy_existing_table(conn, table_obj, val.get("number_of_rows"))
+    def _create_tables_concurrently(
+        self, tables, table_config, generated_columns, fragments
+    ):
+        """create tables on concurrent connections and write them to fragments
+
+        A table is started when all tables it references are done.
+        """
+        dependencies = {
+            key: self._get_referenced_tables(table_config[key]) & (set(tables) - {key})
+            for key in tables
+        }
+
+        with ThreadPoolExecutor(self.connections) as executor:
+            running = {}
+            done = set()
+            pending = list(tables)
+
+            while pending or running:
+                for key in [key for key in pending if dependencies[key] <= done]:
+                    pending.remove(key)
+                    future = executor.submit(
+                        self._create_table_fragment,
+                        fragments[key],
+                        key,
+                        table_config[key],
+                        generated_columns.get(key),
+                    )
+                    running[future] = key
+
+                if not running:
+                    raise ValueError(f"Tables {pending} reference each other")
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    # raise errors of the table
+                    future.result()
+                    done.add(running.pop(future))
+
+    def _create_table_fragment(
+        self, fragment, table_name, table_config, generated, conn=None
+    ):
+        """create a table and write it to a fragment
+
+        Without a connection the table is created in its own transaction.
+        """
+        self._local.fragment = fragment
+        try:
+            if conn is not None:
+                self._create_table(conn, table_name, table_config, generated)
+                return
+
+            with self.engine.connect() as conn:
+                transaction = conn.begin()
+                self._create_table(conn, table_name, table_config, generated)
+                transaction.rollback()
+        finally:
+            self._local.fragment = None
+
+    def _get_fragment_keys(self, conn, table_config):
+        """get hashes of all inputs of the tables
+
+        The key of a table contains its yaml block, the settings of the
+        generator, the schema of copied tables and the keys of all tables it
+        references, as their values are used.
+        """
+        keys = {}
+
+        def get_key(table_name):
+            if table_name in keys:
+                # None for tables which reference each other
+                return keys[table_name]
+            keys[table_name] = None
+
+            val = table_config[table_name]
+            inputs = {
+                "table": table_name,
+                "config": val,
+                "generator": val.get("generator", self.generator),
+                "seed": val.get("seed", self.seed),
+                "batch_size": self.batch_size,
+                "output_format": self.output_format,
+                "dialect": conn.dialect.name,
+                "references": {
+                    reference: get_key(reference)
+                    for reference in sorted(
+                        self._get_referenced_tables(val) & table_config.keys()
+                    )
+                },
+            }
+            if val.get("exists"):
+                # copies are regenerated if the schema of the source changes.
+                # Cached entries can be outdated by DDL of other sessions,
+                # hence the source is reflected again
+                reflection_cache.invalidate(conn, table_name)
+                table_obj = reflection_cache.get_table(conn, table_name)
+                inputs["schema"] = str(
+                    CreateTable(table_obj).compile(dialect=conn.dialect)
+                )
 
+            keys[table_name] = hashlib.sha256(
+                json.dumps(inputs, sort_keys=True, default=str).encode()
+            ).hexdigest()
+            return keys[table_name]
+
+        for table_name in table_config:
+            get_key(table_name)
+        return keys
+
+    def _get_fragment_path(self, table_name, fragment_key):
+        """get path of the cached fragment of a table"""
+        return Path(self.cache_dir) / f"{table_name}.{fragment_key[:16]}.sql"
+
+    def _get_outdated_tables(self, table_config, fragment_keys):
+        """get all tables without a cached fragment in the order of the yaml file
+
+        Tables referenced by outdated tables are outdated as well, as their
+        values are needed to create the referencing tables. Unseeded tables
+        get new values when they are created again, hence all tables which
+        reference them are outdated, too.
+        """
+        outdated = {
+            key
+            for key in table_config
+            if not self._get_fragment_path(key, fragment_keys[key]).is_file()
+        }
+        references = {
+            key: self._get_referenced_tables(val) & table_config.keys()
+            for key, val in table_config.items()
+        }
+
+        stack = list(outdated)
+        while stack:
+            key = stack.pop()
+            related = set(references[key])
+            if self._get_table_seed(key, table_config[key]) is None:
+                related.update(
+                    other
+                    for other, referenced in references.items()
+                    if key in referenced
+                )
+            for other in related - outdated:
+                outdated.add(other)
+                stack.append(other)
+
+        return [key for key in table_config if key in outdated]
+
+    def _store_fragments(self, fragments, fragment_keys):
+        """store created fragments in the cache and remove their former versions"""
+        Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+
+        for table_name, fragment in fragments.items():
+            path = self._get_fragment_path(table_name, fragment_keys[table_name])
+            for stale in path.parent.glob("*.sql"):
+                if stale.name.rsplit(".", 2)[0] == table_name:
+                    stale.unlink()
+
+            # write to a temporary file, hence fragments are always complete
+            path_tmp = path.with_suffix(".tmp")
+            fragment.seek(0)
+            with open(path_tmp, "w") as file:
+                shutil.copyfileobj(fragment, file)
+            os.replace(path_tmp, path)
+
+    def _concatenate_fragments(self, table_config, fragments, fragment_keys):
+        """write fragments of all tables in the order of the yaml file"""
+        for table_name in table_config:
+            if table_name in fragments:
+                fragments[table_name].seek(0)
+                shutil.copyfileobj(fragments[table_name], self._output)
             else:
-                self._create_new_table(conn, key, val, val.get("number_of_rows"))
+                path = self._get_fragment_path(table_name, fragment_keys[table_name])
+                with open(path) as file:
+                    shutil.copyfileobj(file, self._output)
+
+    def _get_table_seed(self, table_name, table_config):
+        """get seed of the random stream of a table, None if it is not seeded"""
+        seed = table_config.get("seed", self.seed)
+        if seed is None:
+            return None
+        return derive_seed(seed, table_name)
+
+    def _get_generator(self, table_config):
+        """get name of the generator of a table"""
+        generator = table_config.get("generator", self.generator)
+        if generator not in self.GENERATORS:
+            raise ValueError(
+                f"Unknown generator {generator}, use one of {list(self.GENERATORS)}"
+            )
+        return generator
 
-        # store results in sql file
-        self._store_stmt_in_sql_file(self.path_test_setup, self.string_to_store)
+    @staticmethod
+    def _get_referenced_tables(table_config):
+        """get names of all tables referenced by columns of a table"""
+        return {
+            column_config["references"].rsplit(".", 1)[0]
+            for column_config in (table_config.get("column_names") or {}).values()
+            if column_config.get("references")
+        }
 
     @staticmethod
-    def _get_meta_data(engine):
-        """search db objects like views or tables"""
-        meta_data = MetaData(engine)
-        meta_data.reflect(views=True)
-        return meta_data
+    def _has_references(table_config):
+        """check if a column of a table references another table"""
+        return any(
+            column_config.get("references")
+            for column_config in table_config.get("column_names").values()
+        )
 
-    def _create_new_table(self, conn, table_name, table_config, n_rows):
+    def _create_new_table(
+        self, conn, table_name, table_config, n_rows, generated_columns=None
+    ):
 
         columns = []
         for key, val in table_config.get("column_names").items():
 
-            col_type = val.get("type")
-            col_obj = Column(key, getattr(sqlalchemy, col_type))
+            col_type = getattr(sqlalchemy, val.get("type"))
+            type_arguments = {
+                argument: val[argument]
+                for argument in ("length", "precision", "scale")
+                if argument in val
+            }
+            if type_arguments:
+                col_type = col_type(**type_arguments)
+            col_obj = Column(key, col_type)
             columns.append(col_obj)
 
         # create table instance
-        table_obj = Table(table_name, self._get_meta_data(conn), *columns)
+        table_obj = Table(table_name, MetaData(), *columns)
         # prepare Create table with bind of current connection and execute it
         create_res = CreateTable(table_obj, bind=conn)
         conn.execute(create_res)
-        # add result of create table statement to statement string
-        self.string_to_store += str(create_res) + ";\n"
-
-        val_dict = {}
-        for key, val in table_config.get("column_names").items():
-            val_dict[key] = get_random_list(val, n_rows)
-
-        # get column order for insert statements
-        column_order = [col[0] for col in table_obj.columns._collection]
-
-        test_entries = self.rearrange_dict_for_insert(column_order, val_dict, n_rows)
+        reflection_cache.invalidate(conn, table_name)
+        # add result of create table statement to sql file
+        self._store_statement(str(create_res) + ";\n")
+
+        # generate whole columns, either as lists or as numpy arrays
+        column_configs = table_config.get("column_names")
+        if generated_columns is not None:
+            # columns which were generated by a worker process
+            columns = generated_columns.result()
+        else:
+            columns = _generate_columns(
+                self._get_generator(table_config),
+                [
+                    # draw the values of references from the referenced column
+                    (
+                        {**val, "choices": self._get_referenced_values(val)}
+                        if val.get("references")
+                        else val
+                    )
+                    for val in column_configs.values()
+                ],
+                n_rows,
+                self._get_table_seed(table_name, table_config),
+            )
 
-        # add subset of entries
-        for s in test_entries:
-            insert_res = insert(table_obj, values=s, bind=conn)
+        for key, values in zip(column_configs, columns):
+            if len(values) != n_rows:
+                raise ValueError(
+                    f"Column {key} of table {table_name} has {len(values)} values, "
+                    f"but number_of_rows is {n_rows}"
+                )
+            if f"{table_name}.{key}" in self._referenced_values:
+                self._referenced_values[f"{table_name}.{key}"] = values
+
+        # load and store entries batch wise
+        self._store_rows(
+            conn, table_obj, self._get_row_batches(columns, n_rows), load=True
+        )
+
+    def _store_rows(self, conn, table_obj, batches, load=False):
+        """Store rows as multi-row inserts or as one COPY block
+
+        :param conn: connection to use
+        :param table_obj: table of the rows
+        :param batches: iterable of lists of rows
+        :param load: whether to load the rows into the table as well
+        """
+        if self.output_format == "copy":
+            preparer = conn.dialect.identifier_preparer
+            self._store_statement(get_copy_statement(preparer, table_obj) + ";\n")
+
+        for batch in batches:
+            if load:
+                load_rows(conn, table_obj, batch)
+            if self.output_format == "copy":
+                self._store_statement(format_copy_rows(batch))
+            else:
+                self._store_statement(
+                    self._get_insert_statement(conn, table_obj, batch)
+                )
 
-            s_convert = [
-                "'" + test + "'" if isinstance(test, str) else test for test in s
-            ]
+        if self.output_format == "copy":
+            self._store_statement(COPY_END + "\n")
 
-            # store insert statements in statement string
-            self.string_to_store += (
-                str(insert_res) % dict(zip(column_order, s_convert)) + ";\n"
+    def _get_referenced_values(self, column_config):
+        """get all values of a referenced column which are not NULL"""
+        reference = column_config["references"]
+        values = self._referenced_values.get(reference)
+        if values is None:
+            raise ValueError(
+                f"Referenced column {reference} has to be defined before it is used"
             )
 
-            # conn.execute(insert_res)
-            conn.execute(table_obj.insert(s))
+        if hasattr(values, "compressed"):
+            # masked numpy array
+            values = values.compressed()
+        if hasattr(values, "tolist"):
+            values = values.tolist()
+        else:
+            values = [value for value in values if value is not None]
+        if len(values) == 0:
+            raise ValueError(f"Referenced column {reference} contains no values")
+        return values
+
+    def _get_row_batches(self, columns, n_rows):
+        """transpose columns batch wise into lists of rows"""
+        for start in range(0, n_rows, self.batch_size):
+            end = start + self.batch_size
+            # tolist() converts numpy values to python objects at once
+            batch_columns = [
+                (
+                    values[start:end].tolist()
+                    if hasattr(values, "tolist")
+                    else values[start:end]
+                )
+                for values in columns
+            ]
+            yield list(zip(*batch_columns))
 
     @staticmethod
     def rearrange_dict_for_insert(column_order, insert_dict, n_rows):
 
-        result = []
-        for i in range(n_rows):
-            result.append([insert_dict[col][i] for col in column_order])
-        return tuple(result)
-
-    @staticmethod
-    def _store_stmt_in_sql_file(path: str, statement: str):
-        """Store a statement extracted from yaml file in sql"""
-        # create path variable
-        path = Path(path)
-
-        # change suffix as we want to store in a .sql file
-        path = path.parent / (path.stem + ".sql")
-
-        with open(path, "w") as file:
-            file.write(statement)
+        columns = [insert_dict[col][:n_rows] for col in column_order]
+        return tuple(zip(*columns))
 
-    def _copy_existing_table(self, conn, table_obj, number_of_rows=-1):
-        """Copy an existing table structure with an additional suffix"""
+    def _copy_existing_table(self, conn, table_obj, number_of_rows=-1, seed=None):
+        """Copy an existing table structure with an additional suffix
 
-        # store rows of original table
-        table_entries = conn.execute(table_obj.select()).all()
+        The database draws a random subset, hence only the requested rows
+        are transferred. With a seed the rows are ordered by a hash of the
+        seed and their key, hence the copy is reproducible. Dialects without
+        a seeded order read the rows in a fixed order and sample them in
+        python, which transfers the whole table.
+        """
+        rng = random if seed is None else random.Random(seed)
+        # a fixed order of all rows is needed for reproducible copies
+        order = list(table_obj.primary_key.columns) or list(table_obj.columns)
 
         # take all data or just a subset of the original table
-        if number_of_rows != -1:
-            try:
-                test_entries = random.sample(table_entries, number_of_rows)
-            except ValueError:
+        if number_of_rows is not None and number_of_rows != -1:
+            if seed is None:
+                sample_order = [self._get_random_function(conn.dialect)]
+            else:
+                # the fixed order breaks ties of equal hashes
+                seeded_order = self._get_seeded_order(conn.dialect, order, seed)
+                sample_order = None if seeded_order is None else [seeded_order, *order]
+
+            if sample_order is not None:
+                # let the database draw the random subset
+                select_stmt = (
+                    table_obj.select().order_by(*sample_order).limit(number_of_rows)
+                )
+                test_entries = conn.execute(select_stmt).all()
+            else:
+                test_entries = self._sample_rows(
+                    self._stream_rows(conn, table_obj.select().order_by(*order)),
+                    number_of_rows,
+                    rng,
+                )
+
+            if len(test_entries) < number_of_rows:
                 logging.error(
                     "Number of rows specified in yaml file exceeds rows in table"
                 )
-                raise
+                raise ValueError("Sample larger than number of rows in table")
         else:
-            # in case of no subset take the whole data set, hence all entries
-            # in table
-            test_entries = table_entries
+            # in case of no subset take the whole data set and stream it with
+            # a server side cursor directly into the sql file
+            select_stmt = table_obj.select()
+            if seed is not None:
+                select_stmt = select_stmt.order_by(*order)
+            test_entries = self._stream_rows(conn, select_stmt)
 
-        self._change_table_constraints(table_obj)
+        self._change_table_constraints(table_obj, rng)
 
         # create table object, store it and execute it
         create_res = CreateTable(table_obj, bind=conn)
 
-        # add result of create table statement to statement string
-        self.string_to_store += str(create_res) + ";\n"
+        # add result of create table statement to sql file
+        self._store_statement(str(create_res) + ";\n")
+
+        # keep values of columns which are referenced by generated tables
+        referenced_columns = {
+            index: f"{table_obj.name}.{col.name}"
+            for index, col in enumerate(table_obj.columns)
+            if f"{table_obj.name}.{col.name}" in self._referenced_values
+        }
+        for reference in referenced_columns.values():
+            self._referenced_values[reference] = []
+
+        # store entries batch wise
+        self._store_rows(
+            conn,
+            table_obj,
+            self._collect_referenced_values(
+                get_batches(test_entries, self.batch_size), referenced_columns
+            ),
+        )
+
+    def _collect_referenced_values(self, batches, referenced_columns):
+        """keep values of referenced columns while batches are passed through"""
+        for batch in batches:
+            for index, reference in referenced_columns.items():
+                self._referenced_values[reference].extend(row[index] for row in batch)
+            yield batch
+
+    def _stream_rows(self, conn, select_stmt):
+        """execute a select with a server side cursor"""
+        return conn.execution_options(
+            stream_results=True, max_row_buffer=self.batch_size
+        ).execute(select_stmt)
 
-        # get column order for insert statements
-        column_order = [col[0] for col in table_obj.columns._collection]
+    @staticmethod
+    def _sample_rows(rows, number_of_rows, rng):
+        """draw a random sample of rows with reservoir sampling"""
+        sample = []
+        for index, row in enumerate(rows):
+            if index < number_of_rows:
+                sample.append(row)
+            else:
+                position = rng.randrange(index + 1)
+                if position < number_of_rows:
+                    sample[position] = row
+        return sample
 
-        # add subset of entries
-        for s in test_entries:
-            insert_res = insert(table_obj, values=s, bind=conn)
+    @staticmethod
+    def _get_literal_renderers(dialect, table_obj):
+        """get a function per column which renders a value as sql literal"""
+        renderers = []
+        for col in table_obj.columns:
+            processor = col.type.literal_processor(dialect)
+            if processor is None and isinstance(
+                col.type, (sqlalchemy.Date, sqlalchemy.DateTime, sqlalchemy.Time)
+            ):
+                # most dialects have no literal processor for temporal types
+                processor = _render_temporal_literal
+            elif processor is None:
+                # let sqlalchemy render types without literal processor
+                processor = partial(_compile_literal, dialect=dialect, type_=col.type)
+            renderers.append(processor)
+        return renderers
+
+    def _get_insert_statement(self, conn, table_obj, rows):
+        """Render a multi-row insert statement with literal values
+
+        Values are rendered with the literal processors of the column types
+        instead of compiling an insert construct, as compiling does not scale
+        to thousands of rows.
+        """
+        preparer = conn.dialect.identifier_preparer
+        renderers = self._get_literal_renderers(conn.dialect, table_obj)
+        columns = ", ".join(preparer.format_column(col) for col in table_obj.columns)
+
+        values = ",\n       ".join(
+            "("
+            + ", ".join(
+                "NULL" if value is None else render(value)
+                for render, value in zip(renderers, row)
+            )
+            + ")"
+            for row in rows
+        )
+        return (
+            f"INSERT INTO {preparer.format_table(table_obj)} ({columns})\n"
+            f"VALUES {values};\n"
+        )
 
-            s_convert = [
-                "'" + test + "'" if isinstance(test, str) else test for test in s
-            ]
+    @staticmethod
+    def _get_random_function(dialect):
+        """get sql function which returns a random value for ordering"""
+        if dialect.name in ("mysql", "mariadb"):
+            return func.rand()
+        if dialect.name == "mssql":
+            return func.newid()
+        return func.random()
 
-            # store insert statements in statement string
-            self.string_to_store += (
-                str(insert_res) % dict(zip(column_order, s_convert)) + ";\n"
-            )
+    @staticmethod
+    def _get_seeded_order(dialect, columns, seed):
+        """get sql expression which orders rows randomly but reproducibly
+
+        :return: md5 hash of the seed and the columns, None if the dialect
+            is not supported
+        """
+        if dialect.name != "postgresql":
+            return None
+        return func.md5(
+            func.concat(str(seed), *(cast(column, Text) for column in columns))
+        )
 
     @staticmethod
-    def _change_table_constraints(table_obj):
+    def _change_table_constraints(table_obj, rng=random):
         """Change name of table constraints"""
         new_constraints = []
         for c in table_obj.constraints:
             constraint = c
-            constraint.name = constraint.name + "_" + get_random_suffix(8)
+            # unnamed constraints get their name from the database
+            if constraint.name is None:
+                continue
+            constraint.name = constraint.name + "_" + get_random_suffix(8, rng)
             new_constraints.append(constraint)
@@ -1,46 +1,56 @@
-class SqlStatementProperties:
-    IDENTIFIER = {
-        "PRE_TABLE_STATEMENTS": ["from", "join", "table", "into", "update"],
-        "PRE_VIEW_STATEMENTS": ["view"],
-    }
+from .sql_tokenizer import find_objects, parse_statements
+
 
+class SqlStatementProperties:
     def __init__(self, statement_list):
         self.statement_list = statement_list
+        self._parsed_statements = None
+
+    @classmethod
+    def from_sql(cls, sql, statement_separator=";"):
+        """Create properties by splitting and searching sql text in one pass"""
+        parsed_statements = list(parse_statements(sql, statement_separator))
+
+        properties = cls([statement.text for statement in parsed_statements])
+        properties._parsed_statements = parsed_statements
+        return properties
+
+    @property
+    def parsed_statements(self):
+        """Get statements including the db objects they refer to"""
+        if self._parsed_statements is None:
+            self._parsed_statements = [
+                find_objects(statement) for statement in self.statement_list
+            ]
+        return self._parsed_statements
 
     @property
     def tables(self):
         """Get all tables specified in statements"""
-        return self._search_statement_list(s_type="PRE_TABLE_STATEMENTS")
+        return self._search_statement_list(s_type="tables")
 
     @property
     def views(self):
         """Get all views specified in statements"""
-        return self._search_statement_list(s_type="PRE_VIEW_STATEMENTS")
+        return self._search_statement_list(s_type="views")
+
+    @property
+    def ctes(self):
+        """Get all common table expressions specified in statements"""
+        return self._search_statement_list(s_type="ctes")
 
-    def _search_statement_list(self, s_type="PRE_TABLE_STATEMENTS"):
+    def _search_statement_list(self, s_type="tables"):
         """Get all objects in statements defined by type"""
         objects = []
 
         # iterate over list of statements
-        for statement in self.statement_list:
+        for statement in self.parsed_statements:
             # add objects of all statements to one list
-            objects.extend(self._search_property_name(statement, s_type))
+            objects.extend(getattr(statement, s_type))
 
         # get rid of duplicates and return list
         return list(set(objects))
 
-    def _search_property_name(self, statement, s_type="PRE_TABLE_STATEMENTS"):
-        w_list = statement.split()
-
-        # search for table identifiers and return following table name
-        table_list = [
-            w_list[index + 1]
-            for index, word in enumerate(w_list)
-            if word.lower() in self.IDENTIFIER[s_type]
-        ]
-
-        return table_list
-
 
 class YamlProperties:
     def __init__(self, config):
@@ -0,0 +1,490 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+WHITESPACE = "whitespace"
+COMMENT = "comment"
+STRING = "string"
+QUOTED_IDENTIFIER = "quoted_identifier"
+DOLLAR_QUOTED = "dollar_quoted"
+WORD = "word"
+NUMBER = "number"
+PUNCTUATION = "punctuation"
+COPY_DATA = "copy_data"
+
+# keywords which are followed by the name of a table or view
+TABLE_KEYWORDS = {"from", "join", "into", "update", "table", "copy"}
+VIEW_KEYWORDS = {"view"}
+
+# keywords which can be followed by a table valued function, e.g. unnest(...)
+_FUNCTION_KEYWORDS = {"from", "join"}
+
+# keywords which can be placed between a keyword and an object name
+_SKIP_KEYWORDS = {"if", "not", "exists", "only", "lateral"}
+
+# functions which use FROM inside of their parentheses, e.g. extract(year from x)
+_FROM_FUNCTIONS = {"extract", "substring", "trim", "overlay", "position"}
+
+# keywords which can not be an alias of a table
+_CLAUSE_KEYWORDS = {
+    "where",
+    "join",
+    "on",
+    "using",
+    "left",
+    "right",
+    "inner",
+    "outer",
+    "full",
+    "cross",
+    "natural",
+    "group",
+    "order",
+    "having",
+    "limit",
+    "offset",
+    "union",
+    "intersect",
+    "except",
+    "window",
+    "returning",
+    "set",
+    "values",
+    "select",
+    "fetch",
+    "for",
+    "lateral",
+    "tablesample",
+}
+
+# FROM stdin of a COPY statement followed by its rows which end with \.
+_COPY_DATA_PATTERN = r"""
+    (?<![\w$])(?i:from\s+stdin)\b[^;]*;[ \t]*\r?\n?
+    (?P<copy_rows>(?:.*?\n)??)\\\.[ \t]*(?=\r?\n|\Z)
+"""
+
+_TOKEN_PATTERN = re.compile(
+    rf"""
+    (?P<whitespace>\s+)
+    |(?P<comment>--[^\n]*|/\*.*?(?:\*/|\Z))
+    |(?P<string>[eE]'(?:[^'\\]+|\\.|'')*'?|'(?:[^']+|'')*'?)
+    |(?P<quoted_identifier>"(?:[^"]+|"")*"?|`[^`]*`?)
+    |(?P<dollar_quoted>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?(?:\$(?P=tag)\$|\Z))
+    |(?P<copy_data>{_COPY_DATA_PATTERN})
+    |(?P<word>[A-Za-z_][\w$]*)
+    |(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    |(?P<punctuation>.)
+    """,
+    re.S | re.X,
+)
+
+# comments and string literals
+_STRING_PATTERN = r"""
+    --[^\n]*|/\*.*?(?:\*/|\Z)
+    |(?<![\w$])[eE]'(?:[^'\\]+|\\.|'')*'?|'(?:[^']+|'')*'?
+"""
+
+# literals and comments which can contain statement separators
+_LITERAL_PATTERN = rf"""{_STRING_PATTERN}
+    |"(?:[^"]+|"")*"?|`[^`]*`?
+    |(?<![\w$])\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?(?:\$(?P=tag)\$|\Z)
+"""
+
+# row of a VALUES clause without nested parentheses, comments, backslashes
+# and dollar quoted strings. Every character can be matched in one way only
+# (plain characters between single dashes, slashes and strings), hence rows
+# which do not match fail in linear time
+_SIMPLE_ROW_PATTERN = r"""
+    \([^()'"`\\$;/-]*
+    (?:(?:-(?!-)|/(?!\*)|'[^'\\]*(?:''[^'\\]*)*')[^()'"`\\$;/-]*)*\)
+"""
+
+# INSERT ... VALUES statement which can be split without tokenization
+_SIMPLE_INSERT_PATTERN = re.compile(
+    rf"""
+    \s*(?P<head>insert\s+into\s[^()'"`\\$;/-]*?(?:\([^()'"`\\$;/-]*\))?\s*(?<![\w$])values)
+    \s*(?P<rows>{_SIMPLE_ROW_PATTERN}(?:\s*,\s*{_SIMPLE_ROW_PATTERN})*)\s*
+    """,
+    re.I | re.S | re.X,
+)
+
+# words and punctuation of the head of a simple INSERT statement
+_HEAD_TOKEN_PATTERN = re.compile(r"[\w$]+|\S")
+
+Token = namedtuple("Token", ["type", "value", "start"])
+ParsedStatement = namedtuple("ParsedStatement", ["text", "tables", "views", "ctes"])
+InsertValues = namedtuple("InsertValues", ["key", "head", "rows"])
+
+
+def tokenize(sql):
+    """Split sql text into tokens
+
+    The tokenizer knows about string literals, quoted identifiers, comments
+    and dollar quoted strings (e.g. postgresql function bodies), hence
+    characters like semicolons inside of them are not treated as
+    punctuation. The text is scanned exactly once.
+
+    :param sql: sql text
+    :return: generator of tokens
+    """
+    for match in _TOKEN_PATTERN.finditer(sql):
+        yield Token(match.lastgroup, match.group(), match.start())
+
+
+def _get_significant_tokens(sql):
+    """get all tokens which are neither whitespace nor comments"""
+    for match in _TOKEN_PATTERN.finditer(sql):
+        if match.lastgroup not in (WHITESPACE, COMMENT):
+            yield Token(match.lastgroup, match.group(), match.start())
+
+
+def parse_statements(sql, statement_separator=";"):
+    """Split sql text into statements and search referenced db objects
+
+    Statements are separated by the statement separator if it is not part of
+    a literal, an identifier or a comment. The text of a statement is the
+    text between two separators, hence the result equals sql.split(";") for
+    simple statements.
+
+    :param sql: sql text
+    :param statement_separator: separator of statements
+    :return: generator of parsed statements
+    """
+    separator = statement_separator.lower()
+    start = 0
+    significant_tokens = []
+
+    for token in _get_significant_tokens(sql):
+        if token.type in (PUNCTUATION, WORD) and token.value.lower() == separator:
+            end = token.start
+            yield _get_parsed_statement(sql[start:end], significant_tokens)
+            start = end + len(token.value)
+            significant_tokens = []
+        elif token.type == COPY_DATA:
+            # the rows of a COPY statement end the statement
+            significant_tokens.append(token)
+            end = token.start + len(token.value)
+            yield _get_parsed_statement(sql[start:end], significant_tokens)
+            start = end
+            significant_tokens = []
+        else:
+            significant_tokens.append(token)
+
+    yield _get_parsed_statement(sql[start:], significant_tokens)
+
+
+@lru_cache(maxsize=None)
+def _get_split_pattern(statement_separator):
+    """compile pattern which matches literals, comments and separators"""
+    separator = re.escape(statement_separator)
+    if re.fullmatch(r"\w+", statement_separator):
+        separator = rf"(?<![\w$]){separator}(?![\w$])"
+
+    return re.compile(
+        rf"""
+        (?P<copy_data>{_COPY_DATA_PATTERN})
+        |(?P<literal>{_LITERAL_PATTERN})
+        |(?P<separator>{separator})
+        """,
+        re.S | re.X | re.I,
+    )
+
+
+def split_statements(sql, statement_separator=";"):
+    """Split sql text into a list of statements
+
+    Returns the same statements as parse_statements, but only literals,
+    comments and separators are matched. All other text is skipped, hence
+    splitting is much faster than a full tokenization.
+    """
+    statements = []
+    start = 0
+
+    for match in _get_split_pattern(statement_separator).finditer(sql):
+        if match.lastgroup == "separator":
+            end, next_start = match.span()
+            statements.append(sql[start:end])
+            start = next_start
+        elif match.lastgroup == "copy_data":
+            # a COPY statement ends with its rows instead of a separator
+            end = match.end()
+            statements.append(sql[start:end])
+            start = end
+
+    statements.append(sql[start:])
+    return statements
+
+
+def split_copy_rows(sql):
+    """Split sql text into the rows of COPY ... FROM stdin statements and the rest
+
+    :param sql: sql text
+    :return: generator of tuples with a text and whether it contains rows
+    """
+    start = 0
+    for match in _get_split_pattern(";").finditer(sql):
+        if match.lastgroup == "copy_data":
+            rows_start, rows_end = match.span("copy_rows")
+            yield sql[start:rows_start], False
+            yield sql[rows_start:rows_end], True
+            start = rows_end
+    yield sql[start:], False
+
+
+def transform_sql(sql, function):
+    """Apply a function to sql text but keep the rows of COPY statements"""
+    return "".join(
+        text if is_rows else function(text) for text, is_rows in split_copy_rows(sql)
+    )
+
+
+def split_insert_values(statement, literals_only=False):
+    """Split an INSERT ... VALUES statement into its head and its rows
+
+    The head is the text up to VALUES. The key is the normalized head, hence
+    statements with an equal key insert into the same columns of the same
+    table.
+
+    :param statement: sql statement
+    :param literals_only: whether rows must not contain parentheses, i.e.
+        subqueries or function calls whose values can depend on other rows
+    :return: InsertValues, None if the statement is no INSERT ... VALUES
+        statement or contains anything else than rows after VALUES, e.g.
+        ON CONFLICT or RETURNING
+    """
+    match = _SIMPLE_INSERT_PATTERN.fullmatch(statement)
+    if match is not None:
+        head = match.group("head")
+        key = " ".join(_HEAD_TOKEN_PATTERN.findall(head.lower()))
+        return InsertValues(key, head, match.group("rows"))
+    if literals_only:
+        return None
+
+    tokens = list(_get_significant_tokens(statement))
+    values = [
+        token.value.lower() if token.type == WORD else token.value for token in tokens
+    ]
+    if values[:2] != ["insert", "into"] or "values" not in values:
+        return None
+
+    values_index = values.index("values")
+    closing = _get_closing_parentheses(values)
+
+    # VALUES has to be followed by a comma separated list of rows only
+    index = values_index + 1
+    while True:
+        if index >= len(values) or values[index] != "(" or index not in closing:
+            return None
+        index = closing[index] + 1
+        if index == len(values):
+            break
+        if values[index] != ",":
+            return None
+        index += 1
+
+    key = " ".join(values[: values_index + 1])
+    head_start = tokens[0].start
+    head_end = tokens[values_index].start + len("values")
+    rows_start = tokens[values_index + 1].start
+    rows_end = tokens[-1].start + len(tokens[-1].value)
+    return InsertValues(
+        key, statement[head_start:head_end], statement[rows_start:rows_end]
+    )
+
+
+def find_objects(sql):
+    """Get tables, views and common table expressions referenced in sql text"""
+    return _get_parsed_statement(sql, list(_get_significant_tokens(sql)))
+
+
+def _get_parsed_statement(text, tokens):
+    """search db objects in the significant tokens of a statement"""
+    values = [
+        token.value.lower() if token.type == WORD else token.value for token in tokens
+    ]
+    closing = _get_closing_parentheses(values)
+
+    ctes = _search_ctes(tokens, values, closing)
+    tables, views = _search_objects(tokens, values, closing)
+
+    return ParsedStatement(
+        text=text,
+        tables=[table for table in tables if table not in ctes],
+        views=views,
+        ctes=ctes,
+    )
+
+
+def _get_closing_parentheses(values):
+    """get index of matching closing parenthesis for every opening parenthesis"""
+    closing = {}
+    stack = []
+    for index, value in enumerate(values):
+        if value == "(":
+            stack.append(index)
+        elif value == ")" and stack:
+            closing[stack.pop()] = index
+    return closing
+
+
+def _get_name(token):
+    """get name of an identifier without quotes"""
+    if token.type == QUOTED_IDENTIFIER:
+        quote = token.value[0]
+        return token.value.strip(quote).replace(quote * 2, quote)
+    return token.value
+
+
+def _is_identifier(tokens, index):
+    """check if token at index is a (quoted) identifier"""
+    return index < len(tokens) and tokens[index].type in (WORD, QUOTED_IDENTIFIER)
+
+
+def _read_object_name(tokens, values, index):
+    """read a possibly schema qualified object name starting at index"""
+    while _is_identifier(tokens, index) and values[index] in _SKIP_KEYWORDS:
+        index += 1
+
+    if not _is_identifier(tokens, index):
+        return None, index
+
+    parts = [_get_name(tokens[index])]
+    index += 1
+    while (
+        index + 1 < len(tokens)
+        and values[index] == "."
+        and _is_identifier(tokens, index + 1)
+    ):
+        parts.append(_get_name(tokens[index + 1]))
+        index += 2
+
+    return ".".join(parts), index
+
+
+def _skip_alias(tokens, values, index):
+    """skip an optional alias of a table"""
+    if index < len(values) and values[index] == "as":
+        return index + 2
+    if _is_identifier(tokens, index) and values[index] not in _CLAUSE_KEYWORDS:
+        return index + 1
+    return index
+
+
+def _is_function_call(values, index):
+    """check if an object name ending before index is called, e.g. unnest(...)"""
+    return index < len(values) and values[index] == "("
+
+
+def _skip_join_condition(tokens, values, closing, index):
+    """skip an optional ON or USING clause of a join"""
+    if index >= len(values) or tokens[index].type != WORD:
+        return index
+
+    if values[index] == "using":
+        index += 1
+        if index < len(values) and values[index] == "(":
+            index = closing.get(index, len(values)) + 1
+    elif values[index] == "on":
+        # the condition ends at a clause keyword, a comma or a parenthesis
+        # which closes a subquery
+        index += 1
+        while index < len(values) and values[index] not in (",", ")", ";"):
+            if values[index] == "(":
+                index = closing.get(index, len(values)) + 1
+                continue
+            if tokens[index].type == WORD and values[index] in _CLAUSE_KEYWORDS:
+                break
+            index += 1
+    return index
+
+
+def _search_objects(tokens, values, closing):
+    """search tables and views following table and view keywords"""
+    tables = []
+    views = []
+
+    # remember for every parenthesis whether it belongs to e.g. extract(...)
+    in_from_function = []
+    for index, value in enumerate(values):
+        if value == "(":
+            in_from_function.append(index > 0 and values[index - 1] in _FROM_FUNCTIONS)
+        elif value == ")" and in_from_function:
+            in_from_function.pop()
+
+        if tokens[index].type != WORD:
+            continue
+
+        if value in VIEW_KEYWORDS:
+            name, _ = _read_object_name(tokens, values, index + 1)
+            if name is not None:
+                views.append(name)
+
+        elif value in TABLE_KEYWORDS:
+            if value == "from" and (
+                (in_from_function and in_from_function[-1])
+                or (index > 0 and values[index - 1] == "distinct")
+            ):
+                continue
+
+            name, next_index = _read_object_name(tokens, values, index + 1)
+            if name is not None and not (
+                value in _FUNCTION_KEYWORDS and _is_function_call(values, next_index)
+            ):
+                tables.append(name)
+
+            # FROM and a JOIN with its condition can be followed by a comma
+            # separated list of tables
+            while value in _FUNCTION_KEYWORDS and next_index < len(values):
+                if values[next_index] == "(":
+                    next_index = closing.get(next_index, len(values)) + 1
+                next_index = _skip_alias(tokens, values, next_index)
+                if value == "join":
+                    next_index = _skip_join_condition(
+                        tokens, values, closing, next_index
+                    )
+                if next_index >= len(values) or values[next_index] != ",":
+                    break
+                name, next_index = _read_object_name(tokens, values, next_index + 1)
+                if name is not None and not _is_function_call(values, next_index):
+                    tables.append(name)
+
+    return tables, views
+
+
+def _search_ctes(tokens, values, closing):
+    """search names of common table expressions"""
+    ctes = []
+
+    for index, value in enumerate(values):
+        if value != "with" or tokens[index].type != WORD:
+            continue
+
+        next_index = index + 1
+        if next_index < len(values) and values[next_index] == "recursive":
+            next_index += 1
+
+        while _is_identifier(tokens, next_index):
+            name = _get_name(tokens[next_index])
+            next_index += 1
+
+            # skip optional column list
+            if next_index < len(values) and values[next_index] == "(":
+                next_index = closing.get(next_index, len(values)) + 1
+            if next_index >= len(values) or values[next_index] != "as":
+                break
+            next_index += 1
+            while next_index < len(values) and values[next_index] in (
+                "not",
+                "materialized",
+            ):
+                next_index += 1
+            if next_index >= len(values) or values[next_index] != "(":
+                break
+
+            ctes.append(name)
+            next_index = closing.get(next_index, len(values)) + 1
+            if next_index >= len(values) or values[next_index] != ",":
+                break
+            next_index += 1
+
+    return ctes
@@ -0,0 +1,126 @@
+import os
+import sqlite3
+from threading import Lock
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from .bulk_loader import execute_statement
+from .statement_batching import batch_statements
+from .statement_cache import StatementCache
+from .utils import get_random_suffix
+
+
+def _connect_memory():
+    """connect to a new empty in-memory database"""
+    return sqlite3.connect(":memory:")
+
+
+# engine of which every connection is a new empty in-memory database, hence
+# tests can share the engine and its initialized dialect
+memory_engine = create_engine("sqlite://", creator=_connect_memory, poolclass=NullPool)
+
+
+class SqliteBaseline:
+    """Shared in-memory sqlite database which contains an executed setup
+
+    The setup is executed once into a shared-cache in-memory database. Every
+    connection of the engine of the baseline is a new in-memory database
+    into which the baseline is copied with the backup API of sqlite3, hence
+    tests get a fresh copy of the setup without executing it again.
+
+    :param statements: statements of the setup file
+    :param batch_mode: batch mode of the setup, see batch_statements
+    """
+
+    def __init__(self, statements, batch_mode="statement"):
+        self.uri = f"file:sql_testing_{get_random_suffix(8)}?mode=memory&cache=shared"
+
+        # the shared database exists as long as one connection is open
+        self._connection = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        self._load(statements, batch_mode)
+
+        self.engine = create_engine("sqlite://", creator=self.clone, poolclass=NullPool)
+
+    def _connect(self):
+        """connect to the shared baseline database"""
+        return sqlite3.connect(self.uri, uri=True)
+
+    def _load(self, statements, batch_mode):
+        """execute the setup statements in the baseline and commit them"""
+        engine = create_engine("sqlite://", creator=self._connect, poolclass=NullPool)
+        try:
+            with engine.begin() as conn:
+                for _, statement in batch_statements(
+                    statements, batch_mode, conn.dialect
+                ):
+                    execute_statement(conn, statement)
+        finally:
+            engine.dispose()
+
+    def clone(self):
+        """Get a new in-memory connection with a copy of the baseline"""
+        source = self._connect()
+        target = sqlite3.connect(":memory:")
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+        return target
+
+    def close(self):
+        """Close the baseline, the shared database is removed"""
+        self.engine.dispose()
+        self._connection.close()
+
+
+class SqliteBaselineCache:
+    """Process-wide cache of sqlite baselines of setup files
+
+    Entries are keyed by the path of the setup file and the batch mode. The
+    modification time and size of the file are stored with every entry,
+    hence a changed setup results in a new baseline.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = Lock()
+
+    def get_baseline(self, path_test_setup, statements, batch_mode="statement"):
+        """Get the baseline of a setup file, create it if it does not exist
+
+        :param path_test_setup: path to the setup file
+        :param statements: statements of the setup file
+        :param batch_mode: batch mode of the setup, see batch_statements
+        :return: SqliteBaseline
+        """
+        signature = StatementCache._get_signature(path_test_setup)
+        key = (os.path.abspath(path_test_setup), batch_mode)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            baseline = SqliteBaseline(statements, batch_mode)
+            self._entries[key] = (signature, baseline)
+
+        if entry is not None:
+            entry[1].close()
+        return baseline
+
+    def invalidate(self, path=None):
+        """Close baselines of a setup file or all baselines if no path is given"""
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if path is None or key[0] == os.path.abspath(path)
+            ]
+            entries = [self._entries.pop(key) for key in keys]
+
+        for _, baseline in entries:
+            baseline.close()
+
+
+sqlite_baselines = SqliteBaselineCache()
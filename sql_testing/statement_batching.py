@@ -0,0 +1,112 @@
+from .bulk_loader import split_copy_statement
+from .sql_tokenizer import split_insert_values
+
+BATCH_MODES = ("statement", "inserts", "script")
+
+# maximal number of statements which are coalesced, sqlite limits the number
+# of rows of a VALUES clause to 500 in older versions
+MAX_COALESCED_STATEMENTS = 500
+
+
+def supports_script(dialect):
+    """Check if the driver executes strings with multiple statements"""
+    return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+
+def _get_statements(statements):
+    """get ordinal and statement of all statements which are not blank"""
+    for ordinal, statement in enumerate(statements):
+        if statement.strip():
+            yield ordinal, statement
+
+
+def coalesce_inserts(statements, max_statements=MAX_COALESCED_STATEMENTS):
+    """Combine consecutive INSERT ... VALUES statements of the same table
+
+    Consecutive statements with an equal head, i.e. the same table and
+    columns, are combined into one multi-row INSERT statement. Only rows of
+    plain literals are combined, as e.g. a subquery of a combined row would
+    not see the rows inserted before it. All other statements are kept and
+    separate the batches, hence the order of all statements is unchanged.
+
+    :param statements: iterable of tuples with ordinal and statement
+    :param max_statements: maximal number of statements combined
+    :return: generator of tuples with the ordinal of the first combined
+        statement and the statement
+    """
+    insert, rows, first_ordinal = None, [], None
+
+    for ordinal, statement in statements:
+        next_insert = split_insert_values(statement, literals_only=True)
+        if (
+            next_insert is not None
+            and insert is not None
+            and next_insert.key == insert.key
+            and len(rows) < max_statements
+        ):
+            rows.append(next_insert.rows)
+            continue
+
+        if insert is not None:
+            yield first_ordinal, f"{insert.head} {', '.join(rows)}"
+
+        insert = next_insert
+        if insert is None:
+            yield ordinal, statement
+        else:
+            rows, first_ordinal = [insert.rows], ordinal
+
+    if insert is not None:
+        yield first_ordinal, f"{insert.head} {', '.join(rows)}"
+
+
+def join_statements(statements):
+    """Join statements into scripts, COPY statements are kept separate
+
+    :param statements: iterable of tuples with ordinal and statement
+    :return: generator of tuples with the ordinal of the first joined
+        statement and the script
+    """
+    script, first_ordinal = [], None
+
+    for ordinal, statement in statements:
+        if split_copy_statement(statement) is None:
+            if not script:
+                first_ordinal = ordinal
+            script.append(statement)
+            continue
+
+        if script:
+            yield first_ordinal, ";".join(script)
+            script = []
+        yield ordinal, statement
+
+    if script:
+        yield first_ordinal, ";".join(script)
+
+
+def batch_statements(statements, batch_mode="statement", dialect=None):
+    """Get the statements of a file to execute in a batch mode
+
+    - statement: every statement is executed on its own
+    - inserts: consecutive INSERT statements of a table are combined
+    - script: all statements between COPY statements are executed at once
+      if the driver supports it, otherwise INSERT statements are combined
+
+    Blank statements are skipped in all modes.
+
+    :param statements: list of statements of a file
+    :param batch_mode: one of BATCH_MODES
+    :param dialect: dialect of the connection which executes the statements
+    :return: generator of tuples with the ordinal of the first statement of
+        a batch and the statement
+    """
+    if batch_mode not in BATCH_MODES:
+        raise ValueError(f"Batch mode {batch_mode} is not one of {BATCH_MODES}")
+
+    statements = _get_statements(statements)
+    if batch_mode == "statement":
+        return statements
+    if batch_mode == "script" and dialect is not None and supports_script(dialect):
+        return join_statements(statements)
+    return coalesce_inserts(statements)
@@ -0,0 +1,86 @@
+import gzip
+import os
+from collections import OrderedDict
+from threading import Lock
+
+
+class StatementCache:
+    """Process-wide cache of parsed files
+
+    Files like a shared setup.sql are read by many tests. The cache stores
+    the parsed content of a file, e.g. the list of statements, so every file
+    is only read and parsed once per session. Entries are keyed by the path
+    of the file and the parser used. The modification time and size of the
+    file are stored with every entry, hence a changed file will be read
+    again. If the cache is full the least recently used entry is evicted.
+
+    :param max_size: maximal number of cached entries
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def _get_signature(path):
+        """get modification time and size of a file"""
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path, parser, *args):
+        """Get parsed content of a file
+
+        The file will only be read and parsed if there is no valid entry in
+        the cache. The parser is called with the file content and all
+        additional arguments.
+
+        :param path: path to file
+        :param parser: function which parses the file content
+        :param args: additional arguments passed to the parser
+        :return: parsed file content
+        """
+        signature = self._get_signature(path)
+        key = (os.path.abspath(path), parser, args)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # gzip compressed files are decompressed transparently
+        open_file = gzip.open if str(path).endswith(".gz") else open
+        with open_file(path, "rt") as file:
+            value = parser(file.read(), *args)
+
+        with self._lock:
+            self._entries[key] = (signature, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def invalidate(self, path=None):
+        """Remove entries of a file or all entries if no path is given"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                return
+
+            path = os.path.abspath(path)
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+
+statement_cache = StatementCache()
+
+
+def invalidate(path=None):
+    """Invalidate cached entries of a file or the whole statement cache"""
+    statement_cache.invalidate(path)
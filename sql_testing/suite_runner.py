@@ -0,0 +1,201 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.pool import QueuePool
+
+
+class CaseResult:
+    """Outcome of a single test case executed by the suite runner
+
+    :param name: name of the test case
+    :param duration: wall time of the test case in seconds
+    :param error: exception raised by the test case (None if it passed)
+    """
+
+    def __init__(self, name, duration, error=None):
+        self.name = name
+        self.duration = duration
+        self.error = error
+
+    @property
+    def passed(self):
+        """Check if test case passed"""
+        return self.error is None
+
+    def __repr__(self):
+        status = "passed" if self.passed else f"failed ({self.error!r})"
+        return f"CaseResult({self.name}, {self.duration:.4f}s, {status})"
+
+
+class SuiteReport:
+    """Collection of case results including aggregated timing information
+
+    :param results: list of CaseResult instances
+    :param wall_time: wall time of the whole suite in seconds
+    :param workers: number of workers used to run the suite
+    """
+
+    def __init__(self, results, wall_time, workers):
+        self.results = results
+        self.wall_time = wall_time
+        self.workers = workers
+
+    @property
+    def passed(self):
+        """Get all passed test cases"""
+        return [res for res in self.results if res.passed]
+
+    @property
+    def failed(self):
+        """Get all failed test cases"""
+        return [res for res in self.results if not res.passed]
+
+    @property
+    def throughput(self):
+        """Get number of executed test cases per second"""
+        if self.wall_time == 0:
+            return float("inf")
+        return len(self.results) / self.wall_time
+
+    def summary(self):
+        """Get a human readable summary of the suite run"""
+        lines = [
+            f"{res.name}: {res.duration:.4f}s {'ok' if res.passed else 'FAILED'}"
+            for res in self.results
+        ]
+        lines.append(
+            f"{len(self.passed)} passed, {len(self.failed)} failed in "
+            f"{self.wall_time:.4f}s with {self.workers} workers "
+            f"({self.throughput:.2f} tests/s)"
+        )
+        return "\n".join(lines)
+
+
+class SuiteRunner:
+    """Run many sql tests concurrently
+
+    Every test case is a tuple of a BaseTest (or DbSpecificTest) instance
+    and the expected output of its target. The test cases are executed in a
+    thread pool. As every run() call checks out its own connection from the
+    engine pool and DbSpecificTest renames all objects with a random suffix,
+    test cases do not interfere with each other. If expected is None the
+    target is compared with the expected file of the test, if it has one.
+    Otherwise the test case only has to run without raising an error.
+
+    The number of workers is capped to the size of the connection pool of
+    the engines used, hence threads never have to wait for a connection.
+
+    :param test_cases: list of (test, expected) tuples
+    :param max_workers: maximal number of concurrently executed test cases
+    """
+
+    def __init__(self, test_cases, max_workers=None):
+        self.test_cases = list(test_cases)
+        self.max_workers = self._get_worker_count(max_workers)
+
+    def _get_worker_count(self, max_workers):
+        """get number of workers limited by pool size of all engines"""
+        capacity = min(
+            [self._get_pool_capacity(test.engine) for test, _ in self.test_cases]
+            + [max(len(self.test_cases), 1)]
+        )
+
+        if max_workers is None:
+            return capacity
+        return max(min(max_workers, capacity), 1)
+
+    @staticmethod
+    def _get_pool_capacity(engine):
+        """get number of connections an engine can hand out at the same time"""
+        # the pool of async engines belongs to their sync engine
+        pool = getattr(engine, "sync_engine", engine).pool
+        if isinstance(pool, QueuePool) and pool._max_overflow >= 0:
+            return pool.size() + pool._max_overflow
+        return float("inf")
+
+    @staticmethod
+    def _get_case_name(test):
+        """get a readable name of a test case"""
+        return f"{test.path_to_call}::{test.target}"
+
+    def _run_case(self, test_case):
+        """run a single test case and measure its wall time"""
+        test, expected = test_case
+        error = None
+
+        start = time.perf_counter()
+        try:
+            if expected is None and test.path_expected is not None:
+                # compare with the expected file of the test
+                comparison = test.compare_with_expected()
+                assert comparison.passed, comparison.summary()
+            else:
+                with test.run() as result:
+                    if expected is not None:
+                        test.compare_table_values(result, expected)
+        except Exception as exc:
+            error = exc
+        duration = time.perf_counter() - start
+
+        return CaseResult(self._get_case_name(test), duration, error)
+
+    def run(self):
+        """run all test cases and return a report"""
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._run_case, self.test_cases))
+        wall_time = time.perf_counter() - start
+
+        return SuiteReport(results, wall_time, self.max_workers)
+
+
+class AsyncSuiteRunner(SuiteRunner):
+    """Run many async sql tests concurrently in one event loop
+
+    Works like SuiteRunner, but the test cases contain AsyncDbSpecificTest
+    instances which are executed as coroutines of a single event loop
+    instead of threads. A semaphore bounds the number of concurrently
+    executed test cases by max_workers and the pool size of the engines.
+
+    :param test_cases: list of (test, expected) tuples
+    :param max_workers: maximal number of concurrently executed test cases
+    """
+
+    async def _run_case_async(self, test_case, semaphore):
+        """run a single test case and measure its wall time"""
+        test, expected = test_case
+        error = None
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if expected is None and test.path_expected is not None:
+                    # compare with the expected file of the test
+                    comparison = await test.compare_with_expected()
+                    assert comparison.passed, comparison.summary()
+                else:
+                    async with test.run() as result:
+                        if expected is not None:
+                            test.compare_table_values(result, expected)
+            except Exception as exc:
+                error = exc
+            duration = time.perf_counter() - start
+
+        return CaseResult(self._get_case_name(test), duration, error)
+
+    async def run_async(self):
+        """run all test cases in the running event loop and return a report"""
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._run_case_async(case, semaphore) for case in self.test_cases)
+        )
+        wall_time = time.perf_counter() - start
+
+        return SuiteReport(list(results), wall_time, self.max_workers)
+
+    def run(self):
+        """run all test cases in a new event loop and return a report"""
+        return asyncio.run(self.run_async())
@@ -0,0 +1,175 @@
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.pool import NullPool
+
+from .bulk_loader import execute_statement
+from .utils import get_random_suffix
+
+
+class TemplateDatabaseCache:
+    """Cache of postgresql template databases which contain a test setup
+
+    Expensive setups are executed only once into a template database. Every
+    test gets a cheap copy of it via CREATE DATABASE ... TEMPLATE. The name
+    of a template contains a hash of the setup file (and of the yaml file it
+    was generated from), hence a changed setup results in a new template and
+    stale templates of the same setup file are dropped as soon as no other
+    session uses them.
+
+    :param engine: engine connected to a postgresql server
+    """
+
+    PREFIX = "sql_testing_tpl_"
+    CLONE_PREFIX = "sql_testing_run_"
+
+    def __init__(self, engine):
+        if engine.dialect.name != "postgresql":
+            raise NotImplementedError(
+                f"Template databases are not implemented for {engine.dialect.name}"
+            )
+        self.engine = engine
+
+    @staticmethod
+    def get_setup_hash(path_test_setup):
+        """Get hash of a setup file and the yaml file it was generated from"""
+        path = Path(path_test_setup)
+        setup_hash = hashlib.sha256(path.read_bytes())
+
+        # the sql file name is the name of the yaml file with a .sql suffix
+        stem = path.name.split(".")[0]
+        for suffix in (".yaml", ".yml"):
+            path_yaml = path.parent / (stem + suffix)
+            if path_yaml.is_file():
+                setup_hash.update(path_yaml.read_bytes())
+
+        return setup_hash.hexdigest()
+
+    def _get_path_prefix(self, path_test_setup):
+        """get name prefix of all templates of a setup file"""
+        path_hash = hashlib.sha256(str(Path(path_test_setup).resolve()).encode())
+        return f"{self.PREFIX}{path_hash.hexdigest()[:8]}_"
+
+    def get_template_name(self, path_test_setup):
+        """Get name of the template database of a setup file"""
+        return (
+            self._get_path_prefix(path_test_setup)
+            + self.get_setup_hash(path_test_setup)[:16]
+        )
+
+    @contextmanager
+    def _autocommit_connection(self):
+        """get a connection which can create and drop databases"""
+        with self.engine.connect() as conn:
+            yield conn.execution_options(isolation_level="AUTOCOMMIT")
+
+    def _get_database_url(self, database):
+        """get url of another database on the same server"""
+        return self.engine.url.set(database=database)
+
+    def _get_databases(self, conn, prefix):
+        """get names of all databases starting with a prefix"""
+        rows = conn.execute(
+            text("SELECT datname FROM pg_database WHERE datname LIKE :prefix"),
+            {"prefix": prefix + "%"},
+        )
+        return {row[0] for row in rows}
+
+    def _quote(self, name):
+        """quote a database name"""
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def get_template(self, path_test_setup, statements):
+        """Get name of the template database, create it if it does not exist
+
+        :param path_test_setup: path to the setup file
+        :param statements: statements of the setup file
+        :return: name of the template database
+        """
+        template = self.get_template_name(path_test_setup)
+
+        with self._autocommit_connection() as conn:
+            # ignore templates which are currently built by other processes
+            existing = {
+                name
+                for name in self._get_databases(
+                    conn, self._get_path_prefix(path_test_setup)
+                )
+                if len(name) == len(template)
+            }
+
+            # drop templates of former versions of the setup file. Templates
+            # which other sessions still clone are dropped by a later call
+            for stale in existing - {template}:
+                try:
+                    conn.execute(text(f"DROP DATABASE IF EXISTS {self._quote(stale)}"))
+                except OperationalError:
+                    continue
+
+            if template in existing:
+                return template
+
+            # build the template under a temporary name, hence incomplete
+            # templates can never be cloned
+            building = template + "_" + get_random_suffix(5)
+            conn.execute(text(f"CREATE DATABASE {self._quote(building)}"))
+
+        try:
+            self._execute_setup(building, statements)
+        except Exception:
+            with self._autocommit_connection() as conn:
+                conn.execute(text(f"DROP DATABASE {self._quote(building)}"))
+            raise
+
+        with self._autocommit_connection() as conn:
+            try:
+                conn.execute(
+                    text(
+                        f"ALTER DATABASE {self._quote(building)} "
+                        f"RENAME TO {self._quote(template)}"
+                    )
+                )
+            except ProgrammingError:
+                # another process created the template in the meantime
+                conn.execute(text(f"DROP DATABASE {self._quote(building)}"))
+
+        return template
+
+    def _execute_setup(self, database, statements):
+        """execute setup statements in a database and commit them"""
+        engine = create_engine(self._get_database_url(database), poolclass=NullPool)
+        try:
+            with engine.begin() as conn:
+                for statement in statements:
+                    if len(statement.strip()) > 0:
+                        execute_statement(conn, statement)
+        finally:
+            engine.dispose()
+
+    @contextmanager
+    def clone(self, template):
+        """Create a copy of a template database and drop it afterwards
+
+        :param template: name of the template database
+        :return: engine connected to the copy
+        """
+        database = self.CLONE_PREFIX + get_random_suffix(8)
+
+        with self._autocommit_connection() as conn:
+            conn.execute(
+                text(
+                    f"CREATE DATABASE {self._quote(database)} "
+                    f"TEMPLATE {self._quote(template)}"
+                )
+            )
+
+        engine = create_engine(self._get_database_url(database), poolclass=NullPool)
+        try:
+            yield engine
+        finally:
+            engine.dispose()
+            with self._autocommit_connection() as conn:
+                conn.execute(text(f"DROP DATABASE {self._quote(database)}"))
@@ -1,50 +1,156 @@
+import hashlib
 import random
 import string
-import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import islice
 from typing import Union
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
 
-def get_random_list(specification: dict, length: int) -> list:
+# kind of generated values per lower case name of a column type
+_VALUE_TYPES = {
+    "boolean": "bool",
+    "bool": "bool",
+    "integer": "int",
+    "int": "int",
+    "biginteger": "int",
+    "smallinteger": "int",
+    "string": "str",
+    "str": "str",
+    "text": "str",
+    "unicode": "str",
+    "float": "float",
+    "numeric": "numeric",
+    "decimal": "numeric",
+    "date": "date",
+    "datetime": "datetime",
+    "timestamp": "datetime",
+}
+
+# value ranges used if a specification does not contain a value_range
+DEFAULT_FLOAT_RANGE = (0.0, 1.0)
+DEFAULT_DATE_RANGE = (date(2000, 1, 1), date(2030, 1, 1))
+
+# characters of random strings and hexadecimal unique ids
+_LETTERS = string.ascii_letters
+_HEX_DIGITS = "0123456789abcdef"
+
+
+def get_random_list(specification: dict, length: int, rng=random) -> list:
     """Get a list of random elements of a specific type
 
     Function generates a random list specified by a specification dictionary.
     Depending on the type of random value the dictionary can vary a bit.
+    Values of every type can be drawn from a list of choices with optional
+    weights and a fraction of them can be replaced by NULL values.
 
     :Example:
 
         specification={
             type: Integer, values: random, value_range: [0, 5], unique: True
         }
+        specification={
+            type: Date, values: random, value_range: [2020-01-01, 2021-01-01],
+            nullable: 0.1
+        }
+        specification={
+            type: String, choices: [new, paid, sent], weights: [1, 5, 10]
+        }
 
     :param specification: dictionary with information about random type generation
     :type specification: dict
     :param length: length of list with random values
     :type length: int
+    :param rng: random.Random instance, e.g. a seeded one for reproducible values
     :return: list with random values of a specified type
     :rtype: list
+    :raise ValueError: if the type is not supported
     """
+    values = _get_random_list(specification, length, rng)
+    return get_nullable_list(values, specification.get("nullable"), rng)
 
-    if specification.get("type").lower() in ["boolean", "bool"]:
-        return get_random_bool_list(specification.get("values"), length)
 
-    elif specification.get("type").lower() in ["integer", "int"]:
+def _get_random_list(specification, length, rng):
+    """get random values without NULL values"""
+    value_type = get_value_type(specification.get("type"))
+
+    if specification.get("choices") is not None:
+        return get_random_choice_list(
+            specification.get("choices"), specification.get("weights"), length, rng
+        )
+
+    if value_type == "bool":
+        return get_random_bool_list(specification.get("values"), length, rng=rng)
+
+    elif value_type == "int":
         return get_random_int_list(
             specification.get("values"),
             specification.get("value_range"),
             length,
             specification.get("unique"),
+            rng=rng,
         )
 
-    elif specification.get("type").lower() in ["string", "str"]:
+    elif value_type == "str":
         return get_random_str_list(
             specification.get("values"),
             length,
             specification.get("unique"),
             specification.get("ignore"),
+            rng=rng,
         )
 
+    elif value_type in ("float", "numeric"):
+        return get_random_float_list(
+            specification.get("values"),
+            specification.get("value_range"),
+            length,
+            specification.get("scale") if value_type == "numeric" else None,
+            rng=rng,
+        )
+
+    elif value_type in ("date", "datetime"):
+        return get_random_datetime_list(
+            specification.get("values"),
+            specification.get("value_range"),
+            length,
+            value_type == "datetime",
+            rng=rng,
+        )
+
+
+def get_value_type(type_name):
+    """Get the kind of values generated for a column type
+
+    :param type_name: name of a sqlalchemy type, e.g. Integer or DateTime
+    :return: one of bool, int, str, float, numeric, date or datetime
+    :raise ValueError: if no values can be generated for the type
+    """
+    try:
+        return _VALUE_TYPES[type_name.lower()]
+    except KeyError:
+        raise ValueError(f"Random values of type {type_name} are not supported")
+
+
+def get_nullable_list(values, fraction, rng=random):
+    """Replace a fraction of the values by None"""
+    if not fraction:
+        return values
+    return [None if rng.random() < fraction else value for value in values]
+
+
+def get_random_choice_list(choices, weights, length, rng=random):
+    """Get a random list of values drawn from choices with optional weights"""
+    return rng.choices(choices, weights=weights, k=length)
+
 
-def get_random_bool_list(values: Union[str, list], length: int, ignore=False) -> list:
+def get_random_bool_list(
+    values: Union[str, list], length: int, ignore=False, rng=random
+) -> list:
     """Get a random list of boolean values
 
     :param values: list of values or random identifier
@@ -55,46 +161,297 @@ def get_random_bool_list(values: Union[str, list], length: int, ignore=False) ->
         return [True for _ in range(length)]
 
     if values == "random":
-        return random.choices([True, False], k=length)
+        return rng.choices([True, False], k=length)
 
     return values
 
 
-def get_random_int_list(values, value_range, length, is_unique, ignore=False):
+def get_random_int_list(
+    values, value_range, length, is_unique, ignore=False, rng=random
+):
     if ignore:
         return [0 for _ in range(length)]
 
     if values == "random":
         if value_range is not None:
             if is_unique:
-                return random.sample(range(value_range[0], value_range[1]), k=length)
+                return rng.sample(range(value_range[0], value_range[1]), k=length)
             else:
-                return random.choices(range(value_range[0], value_range[1]), k=length)
+                return rng.choices(range(value_range[0], value_range[1]), k=length)
         else:
             if is_unique:
-                return random.sample(range(1, length + 1), length)
+                return rng.sample(range(1, length + 1), length)
             else:
-                return random.sample(range(1, int(length / 2)), length)
+                return rng.choices(range(1, max(length // 2, 2)), k=length)
     else:
         return values
 
 
-def get_random_str_list(values, length, is_unique, ignore=False):
+def get_random_str_list(values, length, is_unique, ignore=False, rng=random):
     if ignore:
         return ["NULL" for _ in range(length)]
 
     if values == "random":
 
         if is_unique:
-            return [uuid.uuid4().hex[:6] for _ in range(length)]
-        else:
+            # draw distinct numbers and render them as hexadecimal ids
+            width = _get_id_width(length)
             return [
-                "".join(random.sample(string.ascii_letters, 3)) for _ in range(length)
+                f"{number:0{width}x}" for number in rng.sample(range(16**width), length)
             ]
+        else:
+            return ["".join(rng.sample(_LETTERS, 3)) for _ in range(length)]
+
+
+def get_random_float_list(values, value_range, length, scale=None, rng=random):
+    """Get a random list of floats or of decimals with a fixed scale"""
+    if values != "random":
+        return values
+
+    low, high = value_range or DEFAULT_FLOAT_RANGE
+    result = [rng.uniform(low, high) for _ in range(length)]
+    if scale is None:
+        return result
+    return [Decimal(f"{value:.{scale}f}") for value in result]
+
+
+def get_random_datetime_list(values, value_range, length, with_time=False, rng=random):
+    """Get a random list of dates or datetimes, the end of the range is excluded"""
+    if values != "random":
+        return values
+
+    start, end = (_to_datetime(value) for value in value_range or DEFAULT_DATE_RANGE)
+    if with_time:
+        span = int((end - start).total_seconds())
+        return [start + timedelta(seconds=rng.randrange(span)) for _ in range(length)]
+
+    span = (end - start).days
+    start = start.date()
+    return [start + timedelta(days=rng.randrange(span)) for _ in range(length)]
+
+
+def _to_datetime(value):
+    """convert a date, datetime or iso formatted string to a datetime"""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value))
+
+
+def get_random_array(specification: dict, length: int, rng=None):
+    """Get a numpy array of random elements of a specific type
+
+    Vectorized counterpart of get_random_list which uses the same
+    specification dictionary. Whole columns are generated at once without
+    creating a python object per value, hence it is much faster for large
+    tables. Strings are fixed-width: three random letters or six digit
+    hexadecimal ids if they have to be unique.
 
+    :param specification: dictionary with information about random type generation
+    :type specification: dict
+    :param length: length of array with random values
+    :type length: int
+    :param rng: numpy Generator, e.g. a seeded one for reproducible values
+    :return: array with random values of a specified type
+    :rtype: numpy.ndarray
+    :raise ImportError: if numpy is not installed
+    """
+    if np is None:
+        raise ImportError("numpy is required for the numpy generator")
+
+    if rng is None:
+        rng = np.random.default_rng()
+    values = _get_random_array(rng, specification, length)
+    return get_nullable_array(rng, values, specification.get("nullable"))
+
+
+def _get_random_array(rng, specification, length):
+    """get random values without NULL values"""
+    value_type = get_value_type(specification.get("type"))
+    values = specification.get("values")
+
+    if specification.get("choices") is not None:
+        return get_random_choice_array(
+            rng, specification.get("choices"), specification.get("weights"), length
+        )
+
+    if value_type == "bool":
+        return get_random_bool_array(rng, values, length)
+
+    elif value_type == "int":
+        return get_random_int_array(
+            rng,
+            values,
+            specification.get("value_range"),
+            length,
+            specification.get("unique"),
+        )
 
-def get_random_suffix(length=5):
+    elif value_type == "str":
+        return get_random_str_array(
+            rng,
+            values,
+            length,
+            specification.get("unique"),
+            specification.get("ignore"),
+        )
+
+    elif value_type in ("float", "numeric"):
+        return get_random_float_array(
+            rng,
+            values,
+            specification.get("value_range"),
+            length,
+            specification.get("scale") if value_type == "numeric" else None,
+        )
+
+    elif value_type in ("date", "datetime"):
+        return get_random_datetime_array(
+            rng,
+            values,
+            specification.get("value_range"),
+            length,
+            value_type == "datetime",
+        )
+
+
+def get_nullable_array(rng, values, fraction):
+    """Mask a fraction of the values, masked values are converted to None"""
+    if not fraction:
+        return values
+    return np.ma.masked_array(values, mask=rng.random(len(values)) < fraction)
+
+
+def get_random_choice_array(rng, choices, weights, length):
+    """Get a random array of values drawn from choices with optional weights"""
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+        weights = weights / weights.sum()
+    return rng.choice(np.asarray(choices), size=length, p=weights)
+
+
+def get_random_bool_array(rng, values, length, ignore=False):
+    """Get a random array of boolean values"""
+    if ignore:
+        return np.ones(length, dtype=bool)
+
+    if values == "random":
+        return rng.integers(0, 2, size=length).astype(bool)
+
+    return np.asarray(values)
+
+
+def get_random_int_array(rng, values, value_range, length, is_unique, ignore=False):
+    """Get a random array of integer values"""
+    if ignore:
+        return np.zeros(length, dtype=np.int64)
+
+    if values == "random":
+        if value_range is not None:
+            low, high = value_range
+            if is_unique:
+                return rng.choice(high - low, size=length, replace=False) + low
+            return rng.integers(low, high, size=length)
+
+        if is_unique:
+            return rng.permutation(length) + 1
+        return rng.integers(1, max(length // 2, 2), size=length)
+
+    return np.asarray(values)
+
+
+def get_random_str_array(rng, values, length, is_unique, ignore=False):
+    """Get a random array of fixed-width strings"""
+    if ignore:
+        return np.full(length, "NULL")
+
+    if values == "random":
+        if is_unique:
+            # draw distinct numbers and render them as hexadecimal ids
+            width = _get_id_width(length)
+            numbers = rng.choice(16**width, size=length, replace=False)
+            shifts = np.arange(4 * (width - 1), -1, -4)
+            digits = (numbers[:, None] >> shifts) & 0xF
+            return _join_characters(_HEX_DIGITS, digits)
+
+        return _join_characters(_LETTERS, rng.integers(0, len(_LETTERS), (length, 3)))
+
+    return np.asarray(values)
+
+
+def get_random_float_array(rng, values, value_range, length, scale=None):
+    """Get a random array of floats, rounded to scale decimal places"""
+    if values != "random":
+        return np.asarray(values)
+
+    low, high = value_range or DEFAULT_FLOAT_RANGE
+    result = rng.uniform(low, high, size=length)
+    if scale is None:
+        return result
+    return result.round(scale)
+
+
+def get_random_datetime_array(rng, values, value_range, length, with_time=False):
+    """Get a random array of dates or datetimes, the end of the range is excluded"""
+    if values != "random":
+        return np.asarray(values)
+
+    unit = "s" if with_time else "D"
+    start, end = (
+        np.datetime64(_to_datetime(value), unit)
+        for value in value_range or DEFAULT_DATE_RANGE
+    )
+    span = (end - start).astype(np.int64)
+    return start + rng.integers(0, span, size=length)
+
+
+def _get_id_width(length):
+    """get number of hexadecimal digits needed for length unique ids"""
+    width = 6
+    while 16**width < length:
+        width += 1
+    return width
+
+
+def _join_characters(alphabet, indices):
+    """join rows of a matrix of character indices to fixed-width strings"""
+    characters = np.frombuffer(alphabet.encode(), dtype="S1")[indices]
+    width = indices.shape[1]
+    return characters.view(f"S{width}").ravel().astype(f"U{width}")
+
+
+def get_random_suffix(length=5, rng=random):
     """Create a random db object suffix"""
     chars = string.ascii_lowercase + string.digits
-    random_choice = "".join(random.choice(chars) for _ in range(length))
+    random_choice = "".join(rng.choice(chars) for _ in range(length))
     return random_choice
+
+
+def derive_seed(*parts):
+    """Derive an independent integer seed from a seed and e.g. a table name"""
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def get_rng(generator="python", seed=None):
+    """Get a random number generator for get_random_list or get_random_array
+
+    :param generator: python for random.Random or numpy for a numpy Generator
+    :param seed: seed of the generator, None for an unpredictable one
+    """
+    if generator == "numpy":
+        if np is None:
+            raise ImportError("numpy is required for the numpy generator")
+        return np.random.default_rng(seed)
+    return random.Random(seed)
+
+
+def get_batches(iterable, batch_size):
+    """Split an iterable into lists with a maximal length of batch_size"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
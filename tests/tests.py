@@ -1,10 +1,39 @@
+import asyncio
+import json
 import os
+import shutil
 from tempfile import TemporaryDirectory
-from unittest import TestCase
+from unittest import TestCase, mock
 
+import yaml
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, event, inspect
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
 
+from sql_testing.async_db_specific_test import AsyncDbSpecificTest
 from sql_testing.base_test import BaseTest
+from sql_testing.bulk_loader import format_copy_rows, parse_copy_rows
+from sql_testing.db_specific_test import DbSpecificTest
+from sql_testing.expected_results import read_expected_rows
+from sql_testing.identifier_rewriter import IdentifierRewriter
+from sql_testing.instrumentation import ExecutionReport
+from sql_testing.performance_budget import PerformanceBudget
+from sql_testing.reflection_cache import ReflectionCache, get_existing_object_names
+from sql_testing.result_comparison import compare_rows
+from sql_testing.shared_fixture import SharedFixture
+from sql_testing.sql_file_generator import SqlFileGenerator
+from sql_testing.sql_tokenizer import (
+    find_objects,
+    parse_statements,
+    split_insert_values,
+    split_statements,
+)
+from sql_testing.sqlite_baseline import sqlite_baselines
+from sql_testing.statement_batching import batch_statements
+from sql_testing.statement_cache import StatementCache
+from sql_testing.suite_runner import AsyncSuiteRunner, SuiteRunner
+from sql_testing.template_database import TemplateDatabaseCache
 
 
 class TestBaseTest(TestCase):
@@ -74,3 +103,1254 @@ class TestBaseTest(TestCase):
         with self.assertRaises(OperationalError):
             with base_test.run() as result:
                 base_test.compare_table_values(result, expected)
+
+    def test_engine(self):
+        """ensure passed engines are used and runs get new databases"""
+        engine = create_engine("sqlite://")
+        base_tests = [
+            BaseTest(
+                path_test_setup="tests/fixtures/run_base_test_setup.sql",
+                path_to_call="tests/fixtures/run_base_test_call.sql",
+                target="MEAN_AGE_PER_COUNTRY",
+                engine=engine,
+            )
+            for _ in range(2)
+        ]
+        self.assertIs(base_tests[0].engine, engine)
+
+        # tests sharing an engine do not see objects of each other
+        for base_test in base_tests + base_tests:
+            with base_test.run() as result:
+                self.assertEqual(len(result), 2)
+        self.assertEqual(inspect(engine).get_table_names(), [])
+        self.assertEqual(inspect(engine).get_view_names(), [])
+
+        # without an engine every run gets a new in-memory database
+        base_test = BaseTest(
+            path_test_setup="tests/fixtures/run_base_test_setup.sql",
+            path_to_call="tests/fixtures/run_base_test_call.sql",
+            target="MEAN_AGE_PER_COUNTRY",
+        )
+        for _ in range(2):
+            with base_test.run() as result:
+                self.assertEqual(len(result), 2)
+
+    def test_clone_setup(self):
+        """ensure runs get fresh copies of the setup baseline"""
+        with self.assertRaises(ValueError):
+            BaseTest(
+                path_test_setup="tests/fixtures/run_base_test_setup.sql",
+                path_to_call="tests/fixtures/run_base_test_call.sql",
+                target="MEAN_AGE_PER_COUNTRY",
+                engine=create_engine("sqlite://"),
+                clone_setup=True,
+            )
+
+        with TemporaryDirectory() as temp_dir:
+            path_test_setup = os.path.join(temp_dir, "setup.sql")
+            shutil.copy("tests/fixtures/run_base_test_setup.sql", path_test_setup)
+            path_to_call = os.path.join(temp_dir, "call.sql")
+            with open(path_to_call, "w") as file:
+                file.write(
+                    "INSERT INTO PEOPLE VALUES (5, 'a', 'b', 'c', 20, 1);"
+                    "CREATE VIEW n_people AS SELECT count(*) AS n FROM PEOPLE;"
+                )
+
+            base_test = BaseTest(
+                path_test_setup, path_to_call, "n_people", clone_setup=True
+            )
+
+            # changes of a run are not part of the baseline
+            for _ in range(2):
+                with base_test.run() as result:
+                    self.assertEqual(result, [(5,)])
+            self.assertEqual(
+                {timing.file for timing in base_test.execution_report.timings},
+                {path_to_call, None},
+            )
+
+            # a changed setup results in a new baseline
+            with open(path_test_setup, "a") as file:
+                file.write("\nDELETE FROM PEOPLE WHERE age > 60;")
+            with base_test.run() as result:
+                self.assertEqual(result, [(4,)])
+
+            sqlite_baselines.invalidate(path_test_setup)
+
+    def test_execution_report(self):
+        """test timings and query plans of executed statements"""
+        with TemporaryDirectory() as temp_dir:
+            path_to_call = os.path.join(temp_dir, "call.sql")
+            with open(path_to_call, "w") as file:
+                file.write(
+                    "CREATE TABLE adults AS SELECT * FROM PEOPLE WHERE age > 50;"
+                )
+
+            base_test = BaseTest(
+                path_test_setup="tests/fixtures/run_base_test_setup.sql",
+                path_to_call=path_to_call,
+                target="adults",
+                explain=True,
+            )
+            with base_test.run() as result:
+                self.assertEqual(len(result), 3)
+
+            report = base_test.execution_report
+            labeled = [
+                (timing.file, timing.ordinal)
+                for timing in report.timings
+                if timing.file is not None
+            ]
+            setup = "tests/fixtures/run_base_test_setup.sql"
+            self.assertEqual(
+                labeled[:4], [(setup, 0), (setup, 1), (setup, 2), (setup, 3)]
+            )
+            self.assertEqual(labeled[-1], (path_to_call, 0))
+
+            # only statements of the call file are explained, the EXPLAIN
+            # statements themselves are not recorded
+            call_timing = [t for t in report.timings if t.file == path_to_call][0]
+            self.assertIn("SCAN PEOPLE", str(call_timing.plan))
+            self.assertEqual(call_timing.rowcount, -1)
+            self.assertFalse(any("EXPLAIN" in t.statement for t in report.timings))
+
+            path_report = os.path.join(temp_dir, "report.json")
+            report.to_json(path_report)
+            with open(path_report) as file:
+                exported = json.load(file)
+            self.assertEqual(len(exported["statements"]), len(report.timings))
+            self.assertAlmostEqual(exported["total_time"], report.total_time)
+
+
+class TestSuiteRunner(TestCase):
+    def test_run(self):
+        """test that all test cases are executed and failures are reported"""
+        expected = [(53.5, "USA"), (47.5, "Germany")]
+        test_cases = [
+            (
+                BaseTest(
+                    path_test_setup="tests/fixtures/run_base_test_setup.sql",
+                    path_to_call="tests/fixtures/run_base_test_call.sql",
+                    target="MEAN_AGE_PER_COUNTRY",
+                ),
+                expected,
+            )
+            for _ in range(4)
+        ]
+        test_cases.append(
+            (
+                BaseTest(
+                    path_test_setup="tests/fixtures/run_base_test_setup_invalid.sql",
+                    path_to_call="tests/fixtures/run_base_test_call.sql",
+                    target="MEAN_AGE_PER_COUNTRY",
+                ),
+                expected,
+            )
+        )
+
+        report = SuiteRunner(test_cases, max_workers=3).run()
+
+        self.assertEqual(report.workers, 3)
+        self.assertEqual(len(report.passed), 4)
+        self.assertEqual(len(report.failed), 1)
+        self.assertIsInstance(report.failed[0].error, OperationalError)
+        self.assertGreater(report.throughput, 0)
+
+
+class TestStatementCache(TestCase):
+    def test_get(self):
+        """ensure files are only parsed again after they changed or were invalidated"""
+        cache = StatementCache(max_size=2)
+
+        with TemporaryDirectory() as temp_dir:
+            file_1 = os.path.join(temp_dir, "dummy_file1.sql")
+            with open(file_1, "w") as dummy_file:
+                dummy_file.write("select 1; select 2")
+
+            self.assertEqual(
+                cache.get(file_1, str.split, ";"), ["select 1", " select 2"]
+            )
+            self.assertEqual(
+                cache.get(file_1, str.split, ";"), ["select 1", " select 2"]
+            )
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+            # changed files have to be read again
+            with open(file_1, "w") as dummy_file:
+                dummy_file.write("select 1; select 2; select 3")
+            self.assertEqual(len(cache.get(file_1, str.split, ";")), 3)
+            self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+            cache.invalidate(file_1)
+            cache.get(file_1, str.split, ";")
+            self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+            # least recently used entry will be evicted
+            cache.get(file_1, str.split, ",")
+            cache.get(file_1, str.lower)
+            cache.get(file_1, str.split, ";")
+            self.assertEqual((cache.hits, cache.misses), (1, 6))
+
+
+class TestIdentifierRewriter(TestCase):
+    def test_rewrite(self):
+        """ensure objects are renamed independent of adjacent characters"""
+        rewriter = IdentifierRewriter(
+            {"people": "people_abc", "countries": "countries_abc"}
+        )
+
+        sql = (
+            "select people.age, c.name from public.people,countries c "
+            'join "people"(x) on people_id = 1 where (countries.id=people.id)'
+        )
+        expected = (
+            "select people_abc.age, c.name from public.people_abc,countries_abc c "
+            'join "people_abc"(x) on people_id = 1 where (countries_abc.id=people_abc.id)'
+        )
+
+        self.assertEqual(rewriter.rewrite(sql), expected)
+        self.assertEqual(IdentifierRewriter({}).rewrite(sql), sql)
+
+    def test_rewrite_literals(self):
+        """ensure string literals and comments equal to object names are kept"""
+        rewriter = IdentifierRewriter({"tags": "tags_abc"})
+
+        sql = (
+            "insert into tags values ('tags', e'it\\'s tags', 'it''s tags');"
+            "select name from \"tags\" where name = 'tags' -- tags\n"
+            "/* tags */ and tags.name <> 'x'"
+        )
+        expected = (
+            "insert into tags_abc values ('tags', e'it\\'s tags', 'it''s tags');"
+            "select name from \"tags_abc\" where name = 'tags' -- tags\n"
+            "/* tags */ and tags_abc.name <> 'x'"
+        )
+        self.assertEqual(rewriter.rewrite(sql), expected)
+
+        with TemporaryDirectory() as temp_dir:
+            path_test_setup = os.path.join(temp_dir, "setup.sql")
+            with open(path_test_setup, "w") as file:
+                file.write(
+                    "create table tags (name text); insert into tags values ('tags');"
+                )
+            path_to_call = os.path.join(temp_dir, "call.sql")
+            with open(path_to_call, "w") as file:
+                file.write("create view r as select name from tags where name = 'tags'")
+
+            db_specific_test = DbSpecificTest(
+                engine=create_engine("sqlite://"),
+                path_test_setup=path_test_setup,
+                path_to_call=path_to_call,
+                target="r",
+            )
+            with db_specific_test.run() as result:
+                self.assertEqual(result, [("tags",)])
+
+
+class TestBulkLoader(TestCase):
+    def test_format_copy_rows(self):
+        """ensure special characters and NULL values survive the COPY format"""
+        rows = [[1, "tab\tnew line\nback\\slash", None, True]]
+        self.assertEqual(
+            format_copy_rows(rows), "1\ttab\\tnew line\\nback\\\\slash\t\\N\t1\n"
+        )
+        self.assertEqual(
+            parse_copy_rows(format_copy_rows(rows)),
+            [["1", "tab\tnew line\nback\\slash", None, "1"]],
+        )
+
+    def test_execute_copy_statement(self):
+        """ensure COPY statements are executed as inserts without COPY support"""
+        with TemporaryDirectory() as temp_dir:
+            path_setup = os.path.join(temp_dir, "setup.sql")
+            path_call = os.path.join(temp_dir, "call.sql")
+            with open(path_setup, "w") as setup_file:
+                setup_file.write(
+                    "create table countries (id integer, name text);\n"
+                    "COPY countries (id, name) FROM stdin;\n1\tUSA\n2\t\\N\n\\.\n"
+                )
+            with open(path_call, "w") as call_file:
+                call_file.write(
+                    "create view result as select sum(id), max(name) from countries"
+                )
+
+            db_specific_test = DbSpecificTest(
+                create_engine("sqlite://"), path_setup, path_call, "result"
+            )
+            with db_specific_test.run() as result:
+                self.assertEqual(result, [(3, "USA")])
+
+
+class TestStatementBatching(TestCase):
+    def test_coalesce_inserts(self):
+        """ensure only consecutive inserts of the same table are combined"""
+        statements = [
+            "INSERT INTO a VALUES (1, 'x;y')",
+            "\ninsert into a\nvalues (2, 'z'), (3, NULL)",
+            "INSERT INTO a (id) VALUES (4)",
+            "INSERT INTO a VALUES (5, 'z') RETURNING id",
+            "INSERT INTO a VALUES ((SELECT count(*) FROM a), 'z')",
+            "INSERT INTO a VALUES ((SELECT count(*) FROM a), 'z')",
+            "  ",
+            "INSERT INTO b VALUES (1)",
+            "CREATE TABLE c (id INTEGER)",
+            "INSERT INTO b VALUES (2)",
+        ]
+
+        self.assertEqual(
+            list(batch_statements(statements, "inserts")),
+            [
+                (0, "INSERT INTO a VALUES (1, 'x;y'), (2, 'z'), (3, NULL)"),
+                (2, "INSERT INTO a (id) VALUES (4)"),
+                (3, "INSERT INTO a VALUES (5, 'z') RETURNING id"),
+                (4, "INSERT INTO a VALUES ((SELECT count(*) FROM a), 'z')"),
+                (5, "INSERT INTO a VALUES ((SELECT count(*) FROM a), 'z')"),
+                (7, "INSERT INTO b VALUES (1)"),
+                (8, "CREATE TABLE c (id INTEGER)"),
+                (9, "INSERT INTO b VALUES (2)"),
+            ],
+        )
+
+        # blank statements are skipped, scripts fall back to coalesced inserts
+        self.assertEqual(
+            [ordinal for ordinal, _ in batch_statements(statements)],
+            [0, 1, 2, 3, 4, 5, 7, 8, 9],
+        )
+        self.assertEqual(
+            list(
+                batch_statements(
+                    statements, "script", create_engine("sqlite://").dialect
+                )
+            ),
+            list(batch_statements(statements, "inserts")),
+        )
+        with self.assertRaises(ValueError):
+            list(batch_statements(statements, "unknown"))
+
+    def test_run_batched(self):
+        """ensure batched setups give the same result as single statements"""
+        with TemporaryDirectory() as temp_dir:
+            path_test_setup = os.path.join(temp_dir, "setup.sql")
+            with open(path_test_setup, "w") as file:
+                file.write("CREATE TABLE people (id INTEGER, name TEXT);\n")
+                for index in range(1200):
+                    file.write(
+                        f"INSERT INTO people VALUES ({index}, 'name_{index}');\n"
+                    )
+                file.write("UPDATE people SET name = NULL WHERE id = 5;\n")
+                file.write("INSERT INTO people VALUES (1200, 'last');\n")
+
+                # rows with subqueries have to see the rows inserted before
+                file.write("CREATE TABLE counts (n INTEGER);\n")
+                for _ in range(3):
+                    file.write(
+                        "INSERT INTO counts VALUES ((SELECT count(*) FROM counts));\n"
+                    )
+
+            path_to_call = os.path.join(temp_dir, "call.sql")
+            with open(path_to_call, "w") as file:
+                file.write(
+                    "CREATE VIEW named AS SELECT * FROM people WHERE name IS NOT NULL "
+                    "UNION ALL SELECT n, 'count' FROM counts;"
+                )
+
+            results, n_executed = {}, {}
+            for batch_mode in ["statement", "inserts", "script"]:
+                base_test = BaseTest(
+                    path_test_setup=path_test_setup,
+                    path_to_call=path_to_call,
+                    target="named",
+                    batch_mode=batch_mode,
+                )
+                with base_test.run() as result:
+                    results[batch_mode] = result
+
+                timings = base_test.execution_report.timings
+                n_executed[batch_mode] = [
+                    len([timing for timing in timings if timing.file == path])
+                    for path in [path_test_setup, path_to_call]
+                ]
+
+            self.assertEqual(len(results["statement"]), 1203)
+            self.assertEqual(
+                results["statement"][-3:], [(0, "count"), (1, "count"), (2, "count")]
+            )
+            self.assertEqual(results["inserts"], results["statement"])
+            self.assertEqual(results["script"], results["statement"])
+
+            # inserts are combined in batches of 500 statements, the call file
+            # is always executed statement by statement
+            self.assertEqual(
+                n_executed,
+                {"statement": [1207, 1], "inserts": [10, 1], "script": [10, 1]},
+            )
+
+
+class TestDbSpecificTest(TestCase):
+    def test_run(self):
+        """test run method with renamed db objects"""
+        expected = [(53.5, "usa"), (47.5, "germany")]
+        db_specific_test = DbSpecificTest(
+            engine=create_engine("sqlite://"),
+            path_test_setup="tests/fixtures/run_base_test_setup.sql",
+            path_to_call="tests/fixtures/run_base_test_call.sql",
+            target="MEAN_AGE_PER_COUNTRY",
+        )
+
+        with db_specific_test.run() as result:
+            db_specific_test.compare_table_values(result, expected)
+
+    def test_isolation_modes(self):
+        """ensure unknown and unsupported isolation modes raise errors"""
+        kwargs = dict(
+            engine=create_engine("sqlite://"),
+            path_test_setup="tests/fixtures/run_base_test_setup.sql",
+            path_to_call="tests/fixtures/run_base_test_call.sql",
+            target="MEAN_AGE_PER_COUNTRY",
+        )
+
+        with self.assertRaises(ValueError):
+            DbSpecificTest(isolation="unknown", **kwargs)
+
+        for isolation in ["schema", "template"]:
+            db_specific_test = DbSpecificTest(isolation=isolation, **kwargs)
+            with self.assertRaises(NotImplementedError):
+                with db_specific_test.run():
+                    pass
+
+    def test_schema_isolation(self):
+        """ensure the statements of the schema isolation on a recorded connection"""
+        dialect = postgresql.dialect()
+        statements = []
+        connection = mock.MagicMock(dialect=dialect)
+        connection.execute.side_effect = lambda statement: statements.append(
+            str(statement.compile(dialect=dialect))
+        )
+        connection.exec_driver_sql.side_effect = statements.append
+        engine = mock.MagicMock()
+        engine.connect.return_value.__enter__.return_value = connection
+
+        db_specific_test = DbSpecificTest(
+            engine=create_engine("sqlite://"),
+            path_test_setup="tests/fixtures/run_base_test_setup.sql",
+            path_to_call="tests/fixtures/run_base_test_call.sql",
+            target="MEAN_AGE_PER_COUNTRY",
+            isolation="schema",
+        )
+        paths = [db_specific_test.path_test_setup, db_specific_test.path_to_call]
+        with mock.patch("sql_testing.db_specific_test.inspect") as inspect_mock:
+            inspect_mock.return_value.get_schema_names.return_value = []
+            with mock.patch.object(ExecutionReport, "record"):
+                with db_specific_test._run_files(engine, paths):
+                    pass
+
+        schema = statements[0].split()[-1]
+        self.assertRegex(statements[0], r"^CREATE SCHEMA sql_testing_\w{8}$")
+        self.assertEqual(statements[1], f"SET LOCAL search_path TO {schema}, public")
+        self.assertEqual(statements[-1], f"DROP SCHEMA {schema} CASCADE")
+
+        # files are executed unmodified between them
+        self.assertEqual(
+            statements[2:-1],
+            [
+                statement
+                for path in paths
+                for statement in db_specific_test.read_sql_file(path)
+                if statement.strip()
+            ],
+        )
+        connection.begin.return_value.rollback.assert_called_once()
+
+    def test_performance_budget(self):
+        """test budgets of the call under test and stored baselines"""
+        expected = [(53.5, "usa"), (47.5, "germany")]
+        kwargs = dict(
+            engine=create_engine("sqlite://"),
+            path_test_setup="tests/fixtures/run_base_test_setup.sql",
+            path_to_call="tests/fixtures/run_base_test_call.sql",
+            target="MEAN_AGE_PER_COUNTRY",
+        )
+
+        with self.assertRaises(ValueError):
+            PerformanceBudget(statistic="mean")
+        with self.assertRaises(ValueError):
+            PerformanceBudget(max_regression=10)
+
+        with TemporaryDirectory() as temp_dir:
+            path_baseline = os.path.join(temp_dir, "baseline.json")
+            budget = PerformanceBudget(
+                max_time=10, baseline=path_baseline, iterations=3, statistic="p95"
+            )
+
+            # measured executions are rolled back, hence the call can be
+            # executed again afterwards
+            db_specific_test = DbSpecificTest(**kwargs)
+            with db_specific_test.run(budget=budget) as result:
+                db_specific_test.compare_table_values(result, expected)
+
+            self.assertEqual(len(db_specific_test.budget_result.times), 3)
+            call_timings = [
+                timing
+                for timing in db_specific_test.execution_report.timings
+                if timing.file == kwargs["path_to_call"]
+            ]
+            self.assertEqual(len(call_timings), 1)
+
+            # the first run stores the baseline
+            with open(path_baseline) as file:
+                baselines = json.load(file)
+            self.assertEqual(
+                baselines[kwargs["path_to_call"]], db_specific_test.budget_result.time
+            )
+
+            # exceeded limits raise assertion errors
+            with open(path_baseline, "w") as file:
+                json.dump({kwargs["path_to_call"]: 1e-9}, file)
+            for budget in [
+                PerformanceBudget(max_time=0),
+                PerformanceBudget(max_regression=10, baseline=path_baseline),
+            ]:
+                with self.assertRaises(AssertionError):
+                    with db_specific_test.run(budget=budget):
+                        pass
+
+        # planner costs are only available for postgresql
+        with self.assertRaises(NotImplementedError):
+            with db_specific_test.run(budget=PerformanceBudget(max_cost=100)):
+                pass
+
+
+class TestAsyncDbSpecificTest(TestCase):
+    def test_run(self):
+        """test async runs and the async suite runner with aiosqlite"""
+        expected = [(53.5, "usa"), (47.5, "germany")]
+
+        with TemporaryDirectory() as temp_dir:
+            # in-memory databases of aiosqlite share a single connection
+            engine = create_async_engine(
+                "sqlite+aiosqlite:///" + os.path.join(temp_dir, "test.db")
+            )
+            kwargs = dict(
+                engine=engine,
+                path_test_setup="tests/fixtures/run_base_test_setup.sql",
+                path_to_call="tests/fixtures/run_base_test_call.sql",
+                target="MEAN_AGE_PER_COUNTRY",
+            )
+
+            async def run_test():
+                test = AsyncDbSpecificTest(**kwargs)
+                async with test.run() as result:
+                    test.compare_table_values(result, expected)
+                async with test.run(stream=True) as result:
+                    test.compare_table_values(await result.all(), expected)
+                return test
+
+            test = asyncio.run(run_test())
+            self.assertTrue(test.execution_report.timings)
+
+            test_cases = [(AsyncDbSpecificTest(**kwargs), expected) for _ in range(5)]
+            test_cases.append((AsyncDbSpecificTest(**kwargs), [(1, "usa")]))
+            report = AsyncSuiteRunner(test_cases, max_workers=3).run()
+
+            self.assertEqual(report.workers, 3)
+            self.assertEqual(len(report.passed), 5)
+            self.assertIsInstance(report.failed[0].error, AssertionError)
+
+            asyncio.run(engine.dispose())
+
+        with self.assertRaises(ValueError):
+            AsyncDbSpecificTest(isolation="template", **kwargs)
+
+
+class TestResultComparison(TestCase):
+    def test_compare_rows(self):
+        """ensure ordered and unordered comparisons report differing rows"""
+        expected = [(1, "a"), (2, "b"), (2, "b")]
+
+        self.assertTrue(compare_rows(expected, list(expected)).passed)
+        self.assertFalse(compare_rows(expected, expected[::-1]).passed)
+        self.assertTrue(compare_rows(expected, expected[::-1], ordered=False).passed)
+
+        result = compare_rows(expected, [(2, "b"), (3, "c")], ordered=False)
+        self.assertEqual((result.expected_count, result.actual_count), (3, 2))
+        self.assertEqual(result.n_differences, 3)
+        self.assertEqual(
+            [(diff.expected, diff.actual, diff.count) for diff in result.differences],
+            [((1, "a"), None, 1), ((2, "b"), None, 1), (None, (3, "c"), 1)],
+        )
+
+        result = compare_rows(expected, expected[:1], max_differences=1)
+        self.assertEqual(result.n_differences, 2)
+        self.assertEqual(result.differences[0].position, 1)
+        self.assertIn("1 more", result.summary())
+
+        with self.assertRaises(AssertionError):
+            BaseTest.compare_table_values(expected[:2], expected)
+
+    def test_compare_with_table(self):
+        """ensure targets can be streamed and compared with expected tables"""
+        with TemporaryDirectory() as temp_dir:
+            path_call = os.path.join(temp_dir, "call.sql")
+            with open("tests/fixtures/run_base_test_call.sql") as call_file:
+                call = call_file.read()
+            with open(path_call, "w") as call_file:
+                call_file.write(
+                    call + "create table expected (avg_age real, name text);\n"
+                    "insert into expected values (47.5, 'germany'), (53.5, 'usa');"
+                )
+
+            db_specific_test = DbSpecificTest(
+                create_engine("sqlite://"),
+                "tests/fixtures/run_base_test_setup.sql",
+                path_call,
+                "MEAN_AGE_PER_COUNTRY",
+            )
+            self.assertTrue(db_specific_test.compare_with_table("expected").passed)
+
+            with db_specific_test.run(stream=True) as result:
+                db_specific_test.compare_table_values(
+                    result, [(47.5, "germany"), (53.5, "usa")], ordered=False
+                )
+
+
+class TestExpectedResults(TestCase):
+    def test_compare_with_expected(self):
+        """ensure targets are compared with csv and parquet files"""
+        with TemporaryDirectory() as temp_dir:
+            path_csv = os.path.join(temp_dir, "expected.csv")
+            with open(path_csv, "w") as csv_file:
+                csv_file.write("avg_age,name\n53.5,usa\n47.5,germany\n")
+
+            kwargs = dict(
+                engine=create_engine("sqlite://"),
+                path_test_setup="tests/fixtures/run_base_test_setup.sql",
+                path_to_call="tests/fixtures/run_base_test_call.sql",
+                target="MEAN_AGE_PER_COUNTRY",
+            )
+            db_specific_test = DbSpecificTest(**kwargs, expected=path_csv)
+            self.assertTrue(db_specific_test.compare_with_expected().passed)
+
+            result = db_specific_test.compare_with_expected(
+                column_types={"avg_age": str}
+            )
+            self.assertEqual(result.n_differences, 2)
+
+            report = SuiteRunner([(db_specific_test, None)]).run()
+            self.assertEqual(len(report.passed), 1)
+
+            with self.assertRaises(ValueError):
+                DbSpecificTest(**kwargs).compare_with_expected()
+
+            # parquet files are only supported with the optional pyarrow
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                self.skipTest("pyarrow is not installed")
+
+            path_parquet = os.path.join(temp_dir, "expected.parquet")
+            pyarrow.parquet.write_table(
+                pyarrow.table({"avg_age": [47.5, 53.5], "name": ["germany", "usa"]}),
+                path_parquet,
+            )
+            self.assertEqual(
+                list(read_expected_rows(path_parquet, batch_size=1)),
+                [(47.5, "germany"), (53.5, "usa")],
+            )
+            db_specific_test = DbSpecificTest(**kwargs, expected=path_parquet)
+            self.assertTrue(
+                db_specific_test.compare_with_expected(ordered=False).passed
+            )
+
+
+class TestSqlTokenizer(TestCase):
+    def test_split_statements(self):
+        """ensure separators in literals, comments and dollar quotes are ignored"""
+        sql = (
+            "insert into t values ('a;b', \"c;d\"); -- comment;\n"
+            "create function f() returns int as $body$ select 1; $body$ language sql;"
+            "/* ; */ select 1"
+        )
+        expected = [
+            "insert into t values ('a;b', \"c;d\")",
+            " -- comment;\ncreate function f() returns int as $body$ select 1; $body$ "
+            "language sql",
+            "/* ; */ select 1",
+        ]
+
+        self.assertEqual(split_statements(sql), expected)
+        self.assertEqual(
+            split_statements("select 1; select 2"), "select 1; select 2".split(";")
+        )
+
+    def test_split_copy_statements(self):
+        """ensure rows of COPY statements are part of the statement"""
+        sql = (
+            "create table t (a text);\nCOPY t (a) FROM stdin;\nx;y\n'z\n\\.\n"
+            "select 1"
+        )
+        expected = [
+            "create table t (a text)",
+            "\nCOPY t (a) FROM stdin;\nx;y\n'z\n\\.",
+            "\nselect 1",
+        ]
+
+        self.assertEqual(split_statements(sql), expected)
+        self.assertEqual([s.text for s in parse_statements(sql)], expected)
+        self.assertEqual(find_objects(expected[1]).tables, ["t"])
+
+    def test_split_insert_values(self):
+        """ensure simple and tokenized inserts get equal keys"""
+        simple = split_insert_values("INSERT INTO s.t (a, b)\nVALUES (-1, 'it''s')")
+        self.assertEqual(simple.key, "insert into s . t ( a , b ) values")
+        self.assertEqual(simple.head, "INSERT INTO s.t (a, b)\nVALUES")
+        self.assertEqual(simple.rows, "(-1, 'it''s')")
+
+        # comments and nested parentheses are handled by the tokenizer
+        tokenized = split_insert_values(
+            "insert into s.t(a, b) values (lower('X'), 'a;b') -- comment\n"
+        )
+        self.assertEqual(tokenized.key, simple.key)
+        self.assertEqual(tokenized.rows, "(lower('X'), 'a;b')")
+
+        # rows with function calls or nested parentheses fail fast without
+        # the tokenizer instead of backtracking exponentially
+        for statement in [
+            "INSERT INTO events VALUES (1, 'a', 2, 'b', 3, 4, 5, 6, lower('X'))",
+            "INSERT INTO events VALUES (100, 200, 300, 400, 500, cast(1 as int))",
+            "INSERT INTO events VALUES (1, 2), (3, ((4 + 5) * 6), 7, 8, 9, 10, 11)",
+        ]:
+            self.assertIsNone(split_insert_values(statement, literals_only=True))
+            self.assertEqual(
+                list(batch_statements([statement] * 2, "inserts")),
+                [(0, statement), (1, statement)],
+            )
+
+        for statement in [
+            "INSERT INTO t VALUES (1) RETURNING id",
+            "INSERT INTO t SELECT * FROM s",
+            "INSERT INTO t DEFAULT VALUES",
+            "UPDATE t SET a = 1",
+        ]:
+            self.assertIsNone(split_insert_values(statement))
+
+    def test_find_objects(self):
+        """ensure referenced tables, views and ctes are found"""
+        sql = (
+            "create or replace view v_people as with adults as (select * from people) "
+            "select extract(year from born), * from public.people p, countries c "
+            "join(select * from cities) ci on 1 = 1 left join adults on 1 = 1 "
+            "where x is distinct from y"
+        )
+        objects = find_objects(sql)
+
+        self.assertEqual(objects.views, ["v_people"])
+        self.assertEqual(objects.ctes, ["adults"])
+        self.assertEqual(
+            sorted(objects.tables), ["cities", "countries", "people", "public.people"]
+        )
+
+        # table valued functions are no tables, but INSERT INTO t(a) is
+        sql = (
+            "insert into t(a) select j.value from json_each('[1,2]') j, unnest(x) u, "
+            "people join generate_series(1, 3) g on true "
+            "cross join lateral jsonb_array_elements(j.value) e"
+        )
+        self.assertEqual(find_objects(sql).tables, ["t", "people"])
+
+        # a comma after a join and its condition starts another table
+        sql = (
+            "select * from a join b on a.x = coalesce(b.x, 0), c "
+            "join d using (x), e natural join f, g, generate_series(1, 2) s "
+            "left join h hh on (hh.x = g.x) where e.x in (select x from i)"
+        )
+        self.assertEqual(
+            find_objects(sql).tables, ["a", "b", "c", "d", "e", "f", "g", "h", "i"]
+        )
+
+
+class TestSqlFileGenerator(TestCase):
+    def test_generate_sql_file(self):
+        """ensure generated sql file creates and fills all tables"""
+        with TemporaryDirectory() as temp_dir:
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            path_call = os.path.join(temp_dir, "call.sql")
+            shutil.copy("tests/fixtures/sql_file_generator_setup.yaml", path_yaml)
+            with open(path_call, "w") as call_file:
+                call_file.write("create view result as select sum(age) from people")
+
+            SqlFileGenerator(
+                create_engine("sqlite://"), path_yaml, batch_size=2
+            ).generate_sql_file()
+
+            path_sql = os.path.join(temp_dir, "setup.sql")
+            with open(path_sql) as sql_file:
+                self.assertEqual(sql_file.read().count("INSERT INTO people"), 3)
+
+            base_test = BaseTest(path_sql, path_call, "result")
+            with base_test.run() as result:
+                base_test.compare_table_values(result, [(251,)])
+
+            # a failed generation keeps the former sql file
+            with open(path_sql) as sql_file:
+                content = sql_file.read()
+            with open(path_yaml, "a") as yaml_file:
+                yaml_file.write(
+                    "    broken:\n      number_of_rows: 1\n      column_names:\n"
+                    "        data:\n          type: LargeBinary\n"
+                    "          values: random\n"
+                )
+            with self.assertRaises(ValueError):
+                SqlFileGenerator(
+                    create_engine("sqlite://"), path_yaml
+                ).generate_sql_file()
+            with open(path_sql) as sql_file:
+                self.assertEqual(sql_file.read(), content)
+            self.assertEqual(
+                sorted(os.listdir(temp_dir)), ["call.sql", "setup.sql", "setup.yaml"]
+            )
+
+    def test_generate_compressed_sql_file(self):
+        """ensure compressed sql files can be used as test setup"""
+        with TemporaryDirectory() as temp_dir:
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            path_call = os.path.join(temp_dir, "call.sql")
+            shutil.copy("tests/fixtures/sql_file_generator_setup.yaml", path_yaml)
+            with open(path_call, "w") as call_file:
+                call_file.write("create view result as select sum(age) from people")
+
+            generator = SqlFileGenerator(
+                create_engine("sqlite://"), path_yaml, compress=True
+            )
+            generator.generate_sql_file()
+            self.assertEqual(generator.path_sql_file.name, "setup.sql.gz")
+
+            db_specific_test = DbSpecificTest(
+                create_engine("sqlite://"),
+                str(generator.path_sql_file),
+                path_call,
+                "result",
+            )
+            with db_specific_test.run() as result:
+                db_specific_test.compare_table_values(result, [(251,)])
+
+    def test_generate_copy_sql_file(self):
+        """ensure rows can be stored as COPY blocks"""
+        with TemporaryDirectory() as temp_dir:
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            path_call = os.path.join(temp_dir, "call.sql")
+            shutil.copy("tests/fixtures/sql_file_generator_setup.yaml", path_yaml)
+            with open(path_call, "w") as call_file:
+                call_file.write("create view result as select sum(age) from people")
+
+            generator = SqlFileGenerator(
+                create_engine("sqlite://"),
+                path_yaml,
+                batch_size=2,
+                output_format="copy",
+            )
+            generator.generate_sql_file()
+
+            with open(generator.path_sql_file) as sql_file:
+                self.assertEqual(sql_file.read().count("FROM stdin;"), 1)
+
+            base_test = BaseTest(str(generator.path_sql_file), path_call, "result")
+            with base_test.run() as result:
+                base_test.compare_table_values(result, [(251,)])
+
+    def test_generate_sql_file_with_numpy(self):
+        """ensure numpy generated data can be selected in the yaml file"""
+        with TemporaryDirectory() as temp_dir:
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            path_call = os.path.join(temp_dir, "call.sql")
+            with open("tests/fixtures/sql_file_generator_setup.yaml") as yaml_file:
+                config = yaml_file.read()
+            with open(path_yaml, "w") as yaml_file:
+                yaml_file.write("generator: numpy\n" + config)
+            with open(path_call, "w") as call_file:
+                call_file.write(
+                    "create view result as select sum(age), "
+                    "count(distinct contact_id), max(length(first_name)) from people"
+                )
+
+            SqlFileGenerator(create_engine("sqlite://"), path_yaml).generate_sql_file()
+
+            base_test = BaseTest(
+                os.path.join(temp_dir, "setup.sql"), path_call, "result"
+            )
+            with base_test.run() as result:
+                base_test.compare_table_values(result, [(251, 5, 3)])
+
+            with open(path_yaml, "w") as yaml_file:
+                yaml_file.write("generator: unknown\n" + config)
+            with self.assertRaises(ValueError):
+                SqlFileGenerator(
+                    create_engine("sqlite://"), path_yaml
+                ).generate_sql_file()
+
+    def test_generate_related_tables(self):
+        """ensure dates, decimals, choices and references are generated"""
+        with TemporaryDirectory() as temp_dir:
+            path_call = os.path.join(temp_dir, "call.sql")
+            with open(path_call, "w") as call_file:
+                call_file.write(
+                    "create view result as select count(*), "
+                    "min(ordered_at) >= '2021-01-01', max(amount) < 10, "
+                    "(select count(*) from customers "
+                    "where segment not in ('retail', 'business') "
+                    "or signup_date >= '2021-01-01' or balance > 1000) "
+                    "from orders join customers on customer_id = customers.id"
+                )
+
+            for generator in ["python", "numpy"]:
+                path_yaml = os.path.join(temp_dir, f"setup_{generator}.yaml")
+                with open(
+                    "tests/fixtures/sql_file_generator_references.yaml"
+                ) as yaml_file:
+                    config = yaml_file.read()
+                with open(path_yaml, "w") as yaml_file:
+                    yaml_file.write(f"generator: {generator}\n" + config)
+
+                generator = SqlFileGenerator(create_engine("sqlite://"), path_yaml)
+                generator.generate_sql_file()
+
+                base_test = BaseTest(str(generator.path_sql_file), path_call, "result")
+                with base_test.run() as result:
+                    base_test.compare_table_values(result, [(200, 1, 1, 0)])
+
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            with open(path_yaml, "w") as yaml_file:
+                yaml_file.write(
+                    "tables:\n  people:\n    number_of_rows: 1\n    column_names:\n"
+                    "      photo:\n        type: LargeBinary\n        values: random\n"
+                )
+            with self.assertRaises(ValueError):
+                SqlFileGenerator(
+                    create_engine("sqlite://"), path_yaml
+                ).generate_sql_file()
+
+    def test_generate_seeded_sql_file(self):
+        """ensure seeded sql files are reproducible, also with workers
+
+        Tables are also created on concurrent connections, these need a file
+        database as sqlite in-memory databases are not shared between threads.
+        """
+        with TemporaryDirectory() as temp_dir:
+            with open("tests/fixtures/sql_file_generator_references.yaml") as yaml_file:
+                config = yaml_file.read()
+            config += "    countries:\n      exists: True\n      number_of_rows: 3\n"
+
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            contents = []
+            for index, (generator, seed, processes, connections) in enumerate(
+                [
+                    ("python", 1, None, None),
+                    ("python", 1, 2, None),
+                    ("python", 2, None, None),
+                    ("numpy", 1, None, None),
+                    ("numpy", 1, 2, None),
+                    ("python", 1, 2, 3),
+                ]
+            ):
+                # pysqlite does not roll back ddl, hence use a new database
+                engine = create_engine(
+                    "sqlite:///" + os.path.join(temp_dir, f"test_{index}.db")
+                )
+                with engine.begin() as conn:
+                    conn.execute(
+                        "create table countries (id integer primary key, name text)"
+                    )
+                    for i in range(10):
+                        conn.execute(f"insert into countries values ({i}, 'c{i}')")
+
+                with open(path_yaml, "w") as yaml_file:
+                    yaml_file.write(f"generator: {generator}\nseed: {seed}\n" + config)
+
+                sql_file_generator = SqlFileGenerator(
+                    engine, path_yaml, processes=processes, connections=connections
+                )
+                sql_file_generator.generate_sql_file()
+                with open(sql_file_generator.path_sql_file) as sql_file:
+                    contents.append(sql_file.read())
+
+            self.assertEqual(contents[0], contents[1])
+            self.assertNotEqual(contents[0], contents[2])
+            self.assertEqual(contents[3], contents[4])
+            self.assertEqual(contents[0], contents[5])
+
+            # tables which reference each other can not be scheduled
+            with open(path_yaml, "w") as yaml_file:
+                yaml_file.write(
+                    "tables:\n"
+                    "  a:\n    number_of_rows: 1\n    column_names:\n"
+                    "      id:\n        type: Integer\n        references: b.id\n"
+                    "  b:\n    number_of_rows: 1\n    column_names:\n"
+                    "      id:\n        type: Integer\n        references: a.id\n"
+                )
+            with self.assertRaises(ValueError):
+                SqlFileGenerator(
+                    create_engine("sqlite://"), path_yaml, connections=2
+                ).generate_sql_file()
+
+    def test_generate_incremental_sql_file(self):
+        """ensure only tables with changed inputs are created again"""
+
+        def get_engine(country_columns="id integer primary key, name text"):
+            # pysqlite does not roll back ddl, hence use a new database
+            engine = create_engine("sqlite://")
+            with engine.begin() as conn:
+                conn.execute(f"create table countries ({country_columns})")
+                for i in range(10):
+                    conn.execute(f"insert into countries (id) values ({i})")
+            return engine
+
+        with TemporaryDirectory() as temp_dir:
+            with open("tests/fixtures/sql_file_generator_references.yaml") as yaml_file:
+                config = "seed: 1\n" + yaml_file.read()
+            config += "    countries:\n      exists: True\n      number_of_rows: 3\n"
+
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            path_cache = os.path.join(temp_dir, "fragments")
+            with open(path_yaml, "w") as yaml_file:
+                yaml_file.write(config)
+
+            def generate(engine, **kwargs):
+                sql_file_generator = SqlFileGenerator(engine, path_yaml, **kwargs)
+                sql_file_generator.generate_sql_file()
+                with open(sql_file_generator.path_sql_file) as sql_file:
+                    return sql_file_generator.created_tables, sql_file.read()
+
+            _, content = generate(get_engine())
+            self.assertEqual(
+                generate(get_engine(), cache_dir=path_cache),
+                (["customers", "orders", "countries"], content),
+            )
+            self.assertEqual(
+                generate(get_engine(), cache_dir=path_cache), ([], content)
+            )
+            self.assertEqual(len(os.listdir(path_cache)), 3)
+
+            # referenced tables are created again to get their values
+            with open(path_yaml, "w") as yaml_file:
+                yaml_file.write(config.replace("[1, 10]", "[1, 20]"))
+            created, changed_content = generate(get_engine(), cache_dir=path_cache)
+            self.assertEqual(created, ["customers", "orders"])
+            self.assertNotEqual(changed_content, content)
+            self.assertEqual(len(os.listdir(path_cache)), 3)
+
+            # copies are created again if the schema of the source changes
+            created, _ = generate(
+                get_engine("id integer primary key, name text, code text"),
+                cache_dir=path_cache,
+            )
+            self.assertEqual(created, ["countries"])
+
+            # schema changes are detected although the source is cached
+            engine = get_engine()
+            self.assertEqual(generate(engine, cache_dir=path_cache)[0], ["countries"])
+            with engine.begin() as conn:
+                conn.execute("alter table countries add column code text")
+            created, content = generate(engine, cache_dir=path_cache)
+            self.assertEqual(created, ["countries"])
+            self.assertIn("code TEXT", content)
+
+    def test_generate_incremental_unseeded_sql_file(self):
+        """ensure cached tables never reference values of recreated tables"""
+        config = {
+            "tables": {
+                "p": {
+                    "number_of_rows": 5,
+                    "column_names": {
+                        "id": {
+                            "type": "Integer",
+                            "values": "random",
+                            "value_range": [0, 10**6],
+                            "unique": True,
+                        }
+                    },
+                },
+                "a": {
+                    "number_of_rows": 5,
+                    "column_names": {"pid": {"type": "Integer", "references": "p.id"}},
+                },
+                "b": {
+                    "number_of_rows": 5,
+                    "column_names": {"pid": {"type": "Integer", "references": "p.id"}},
+                },
+            }
+        }
+
+        with TemporaryDirectory() as temp_dir:
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            path_cache = os.path.join(temp_dir, "fragments")
+
+            def generate():
+                with open(path_yaml, "w") as yaml_file:
+                    yaml.safe_dump(config, yaml_file, sort_keys=False)
+                sql_file_generator = SqlFileGenerator(
+                    create_engine("sqlite://"), path_yaml, cache_dir=path_cache
+                )
+                sql_file_generator.generate_sql_file()
+
+                engine = create_engine("sqlite://")
+                with engine.begin() as conn:
+                    for statement in BaseTest.read_sql_file(
+                        sql_file_generator.path_sql_file
+                    ):
+                        if statement.strip():
+                            conn.execute(statement)
+                    n_orphans = conn.execute(
+                        "select count(*) from (select pid from a union all "
+                        "select pid from b) where pid not in (select id from p)"
+                    ).scalar()
+                return sql_file_generator.created_tables, n_orphans
+
+            self.assertEqual(generate(), (["p", "a", "b"], 0))
+            self.assertEqual(generate(), ([], 0))
+
+            # the unseeded p gets new values, hence b is created again as well
+            config["tables"]["a"]["number_of_rows"] = 4
+            self.assertEqual(generate(), (["p", "a", "b"], 0))
+
+    def test_copy_existing_table(self):
+        """ensure existing tables are copied completely or as random subset"""
+        with TemporaryDirectory() as temp_dir:
+            engine = create_engine(f"sqlite:///{os.path.join(temp_dir, 'db.sqlite')}")
+            with engine.begin() as conn:
+                conn.execute("create table countries (id integer, name text)")
+                for i in range(10):
+                    conn.execute(f"insert into countries values ({i}, 'c{i}')")
+
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            for number_of_rows, expected in [(3, 3), (-1, 10)]:
+                with open(path_yaml, "w") as yaml_file:
+                    yaml_file.write(
+                        "tables:\n  countries:\n    exists: True\n"
+                        f"    number_of_rows: {number_of_rows}\n"
+                    )
+
+                generator = SqlFileGenerator(engine, path_yaml)
+                generator.generate_sql_file()
+                with open(generator.path_sql_file) as sql_file:
+                    self.assertEqual(sql_file.read().count("'c"), expected)
+
+            with open(path_yaml, "w") as yaml_file:
+                yaml_file.write(
+                    "tables:\n  countries:\n    exists: True\n    number_of_rows: 11\n"
+                )
+            with self.assertRaises(ValueError):
+                SqlFileGenerator(engine, path_yaml).generate_sql_file()
+
+        # postgresql draws seeded subsets itself, other dialects in python
+        table = Table("countries", MetaData(), Column("id", Integer, primary_key=True))
+        seeded_order = SqlFileGenerator._get_seeded_order(
+            postgresql.dialect(), [table.c.id], 42
+        )
+        self.assertEqual(
+            str(
+                seeded_order.compile(
+                    dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+                )
+            ),
+            "md5(concat('42', CAST(countries.id AS TEXT)))",
+        )
+        self.assertIsNone(
+            SqlFileGenerator._get_seeded_order(engine.dialect, [table.c.id], 42)
+        )
+
+
+class TestReflectionCache(TestCase):
+    def test_get_table(self):
+        """ensure tables are cached until they expire or are invalidated"""
+        engine = create_engine("sqlite://")
+        engine.execute("create table people (id integer)")
+        cache = ReflectionCache(ttl=60)
+
+        table = cache.get_table(engine, "people")
+        self.assertEqual([col.name for col in table.columns], ["id"])
+        self.assertIs(cache.get_table(engine, "people"), table)
+        self.assertEqual(cache.get_object_names(engine), {"people"})
+
+        engine.execute("create table countries (id integer)")
+        self.assertEqual(cache.get_object_names(engine), {"people"})
+
+        cache.invalidate(engine, "countries")
+        self.assertEqual(cache.get_object_names(engine), {"people", "countries"})
+        self.assertIs(cache.get_table(engine, "people"), table)
+
+        cache.ttl = 0
+        self.assertIsNot(cache.get_table(engine, "people"), table)
+
+    def test_get_existing_object_names(self):
+        """ensure only existing candidate names are returned"""
+        engine = create_engine("sqlite://")
+        engine.execute("create table people (id integer)")
+        engine.execute("create view adults as select * from people")
+
+        self.assertEqual(
+            get_existing_object_names(engine, ["PEOPLE", "main.adults", "countries"]),
+            {"people", "adults"},
+        )
+        self.assertEqual(get_existing_object_names(engine, []), set())
+
+
+class TestSharedFixture(TestCase):
+    def test_run(self):
+        """ensure calls are rolled back to the shared setup"""
+        engine = create_engine("sqlite://")
+
+        # let sqlalchemy emit BEGIN to support savepoints with pysqlite
+        @event.listens_for(engine, "connect")
+        def do_connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def do_begin(conn):
+            conn.exec_driver_sql("BEGIN")
+
+        expected = [(53.5, "usa"), (47.5, "germany")]
+        fixture = SharedFixture(engine, "tests/fixtures/run_base_test_setup.sql")
+
+        with fixture.setup():
+            # the same view can only be created twice if the savepoint is rolled back
+            for _ in range(2):
+                with fixture.run(
+                    "tests/fixtures/run_base_test_call.sql", "MEAN_AGE_PER_COUNTRY"
+                ) as result:
+                    BaseTest.compare_table_values(result, expected)
+
+            # a failing call does not affect the following calls
+            with self.assertRaises(AssertionError):
+                with fixture.run(
+                    "tests/fixtures/run_base_test_call.sql", "MEAN_AGE_PER_COUNTRY"
+                ) as result:
+                    BaseTest.compare_table_values(result, [])
+            with fixture.run(
+                "tests/fixtures/run_base_test_call.sql", "MEAN_AGE_PER_COUNTRY"
+            ) as result:
+                BaseTest.compare_table_values(result, expected)
+
+        self.assertEqual(len(fixture.call_times), 4)
+        self.assertEqual(fixture.amortized_setup_time, 3 * fixture.setup_time)
+        self.assertEqual(get_existing_object_names(engine, ["people"]), set())
+
+
+class TestTemplateDatabaseCache(TestCase):
+    def test_get_setup_hash(self):
+        """ensure the hash changes if the setup or its yaml file changes"""
+        with TemporaryDirectory() as temp_dir:
+            path_sql = os.path.join(temp_dir, "setup.sql")
+            with open(path_sql, "w") as sql_file:
+                sql_file.write("create table people (id integer)")
+            first_hash = TemplateDatabaseCache.get_setup_hash(path_sql)
+
+            path_yaml = os.path.join(temp_dir, "setup.yaml")
+            with open(path_yaml, "w") as yaml_file:
+                yaml_file.write("tables: {}")
+            second_hash = TemplateDatabaseCache.get_setup_hash(path_sql)
+
+            with open(path_sql, "a") as sql_file:
+                sql_file.write(";")
+            third_hash = TemplateDatabaseCache.get_setup_hash(path_sql)
+
+        self.assertEqual(len({first_hash, second_hash, third_hash}), 3)